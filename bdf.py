@@ -0,0 +1,83 @@
+# LED matrix temperature / UV display
+# Minimal BDF font reader.  Used wherever we need the glyphs themselves rather than the matrix
+# library's own font object, e.g. the matrix emulator.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+
+class Glyph:
+    __slots__ = ('codepoint', 'device_width', 'width', 'height', 'x_offset', 'y_offset', 'rows')
+
+    def __init__(self, codepoint, device_width, width, height, x_offset, y_offset, rows):
+        self.codepoint = codepoint
+        self.device_width = device_width  # how far to advance after this glyph (DWIDTH)
+        self.width = width  # bitmap size and offset from the origin (BBX)
+        self.height = height
+        self.x_offset = x_offset
+        self.y_offset = y_offset
+        self.rows = rows  # one int per bitmap row, bit (width - 1) is the left-most pixel
+
+    def pixels(self):
+        # (column, row) of every lit pixel, relative to the top left of the bitmap
+        for y, row in enumerate(self.rows):
+            for x in range(self.width):
+                if row >> (self.width - 1 - x) & 1:
+                    yield x, y
+
+
+class BDFFont:
+    def __init__(self):
+        self.height = 0  # FONTBOUNDINGBOX height
+        self.baseline = 0  # rows from the top of the bounding box to the baseline
+        self.glyphs = {}  # codepoint -> Glyph
+
+    def glyph(self, codepoint):
+        return self.glyphs.get(codepoint)
+
+
+def load(filename, codepoints=None):
+    # Reads a BDF file.  If codepoints is given, only those glyphs are kept.
+    font = BDFFont()
+
+    with open(filename, "r", encoding="latin-1") as file:
+        codepoint = device_width = None
+        bbx = None
+        rows = None
+
+        for line in file:
+            if rows is not None:
+                # Inside a BITMAP section
+                if line.startswith("ENDCHAR"):
+                    if codepoint is not None and bbx is not None and (codepoints is None or codepoint in codepoints):
+                        width, height, x_offset, y_offset = bbx
+                        # Rows are padded out to whole bytes.  Drop the padding bits.
+                        shift = (width + 7) // 8 * 8 - width
+                        font.glyphs[codepoint] = Glyph(codepoint, device_width, width, height, x_offset, y_offset,
+                                                       [r >> shift for r in rows[:height]])
+                    codepoint = device_width = bbx = rows = None
+                elif codepoint is not None:
+                    rows.append(int(line, 16))
+                continue
+
+            keyword, _, value = line.partition(" ")
+            keyword = keyword.strip()
+
+            if keyword == "ENCODING":
+                codepoint = int(value.split()[0])
+                if codepoint < 0:
+                    codepoint = None
+            elif keyword == "DWIDTH":
+                device_width = int(value.split()[0])
+            elif keyword == "BBX":
+                bbx = tuple(int(v) for v in value.split())
+            elif keyword == "BITMAP":
+                rows = []
+                if codepoints is not None and codepoint not in codepoints:
+                    # Not wanted - skip the bitmap rows without converting them
+                    codepoint = None
+            elif keyword == "FONTBOUNDINGBOX":
+                _, font.height, _, y_offset = (int(v) for v in value.split())
+                font.baseline = font.height + y_offset
+
+    return font
@@ -0,0 +1,288 @@
+# LED matrix temperature / UV display
+# Benchmark suite.  Times the display's hot paths against the matrix emulator and replays recorded
+# Davis V1, V2 and WeatherLink Live responses through get_temp() from a local stub server
+# (benchmarks/stub_server.py).  Reports latency percentiles and memory allocated per call for each
+# function, plus the frame rate refresh_display() could sustain.  Results are JSON so runs from two
+# commits can be compared.
+# Run from the LED_matrix folder:
+#
+#   python benchmarks/bench.py --output before.json
+#   (check out the new version)
+#   python benchmarks/bench.py --output after.json --compare before.json
+#
+# --compare prints the change in median and p99 for each function and exits with status 1 if any
+# median got slower by more than --threshold percent.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import temp_display  # noqa: E402
+from ryb2rgb import ryb2rgb  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+
+# Runs of each function for the timing pass.  Fetches are much slower so they get fewer.
+RUNS = 2000
+FETCH_RUNS = 200
+WARMUP = 20
+
+# Calls traced for the allocation pass.  tracemalloc slows everything down so it is kept separate
+# from the timing pass.
+ALLOC_RUNS = 50
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=HERE,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def time_case(func, runs):
+    for _ in range(WARMUP):
+        func()
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    ordered = sorted(times)
+    return {'runs': runs,
+            'mean_ms': sum(times) / runs * 1000,
+            'p50_ms': percentile(ordered, 50) * 1000,
+            'p90_ms': percentile(ordered, 90) * 1000,
+            'p99_ms': percentile(ordered, 99) * 1000,
+            'max_ms': ordered[-1] * 1000,
+            'per_second': runs / sum(times)}
+
+
+def trace_case(func):
+    # Peak bytes allocated during one call (temporaries included) and bytes still held afterwards.
+    peaks = []
+    retained = 0
+    tracemalloc.start()
+    try:
+        for _ in range(ALLOC_RUNS):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained += after - before
+    finally:
+        tracemalloc.stop()
+
+    peaks.sort()
+    return {'alloc_peak_bytes': percentile(peaks, 50),
+            'alloc_retained_bytes': retained // ALLOC_RUNS}
+
+
+def start_stub_server():
+    # In its own process so neither its CPU time nor its allocations are counted against the display
+    server = subprocess.Popen([sys.executable, os.path.join(HERE, 'stub_server.py'), '--port', '0'],
+                              stdout=subprocess.PIPE, text=True)
+    url = server.stdout.readline().strip()
+    if not url:
+        server.kill()
+        raise SystemExit('Stub server did not start')
+    return server, url
+
+
+def make_folder(prefix):
+    # A temporary folder to run the display in, so the history and station ID files it writes don't
+    # touch the real ones.  Fonts load from the LED_matrix folder through a link.
+    folder = tempfile.mkdtemp(prefix=prefix)
+    os.symlink(os.path.join(HERE, '..', 'fonts'), os.path.join(folder, 'fonts'))
+    return folder
+
+
+def write_config(folder, name, url, v2=False, local=False):
+    # config.json.sample pointed at the stub server, without the light sensor.  With local, the stub
+    # server also stands in for a WeatherLink Live.
+    with open(os.path.join(HERE, '..', 'config.json.sample')) as file:
+        jdata = json.load(file)
+
+    jdata.setdefault("network", {})["weatherlink_url"] = url
+    jdata["dimmer"]["use_sensor"] = False
+    if v2:
+        jdata["davis_weatherlinkIP_interface"]["user"] = ""
+        jdata["OR_davis_console_interface"]["station_name"] = "Cadence at The Lakes"
+    if local:
+        jdata["davis_weatherlink_live_interface"] = {"host": url.partition('://')[2]}
+
+    filename = os.path.join(folder, name)
+    with open(filename, "w") as file:
+        json.dump(jdata, file)
+    return filename
+
+
+def make_data(config_file):
+    options = temp_display.RGBMatrixOptions()
+    options.rows = 32
+    options.cols = 64
+    options.chain_length = 2
+    options.parallel = 1
+    data = temp_display.Data(temp_display.Config(config_file), temp_display.RGBMatrix(options=options))
+
+    # get_temp() asks the scheduler for its time budget.  Not running, so there is no budget.
+    data.scheduler = Scheduler()
+    return data
+
+
+def fetch(data):
+    def run():
+        result = temp_display.get_temp(data)
+        if result != (1, "Success"):
+            raise SystemExit(f'get_temp failed against the stub server: {result}')
+    return run
+
+
+def cases(data_v1, data_v2, data_local):
+    # name -> (function, timing runs)
+    state = {'frame': 0, 'temp': 0}
+
+    def refresh_display():
+        # Alternate between the two right hand panes like the display does
+        state['frame'] += 1
+        data_v1.show_hi_lo_temp = state['frame'] % 2 == 0
+        temp_display.refresh_display(data_v1)
+
+    def refresh_display_unchanged():
+        # Most minutes nothing has changed and the frame is skipped
+        temp_display.refresh_display(data_v1)
+
+    def get_colour():
+        # Walk through every temperature the display can show
+        state['temp'] = (state['temp'] + 1) % 700
+        temp_display.get_colour(data_v1, round(-25 + state['temp'] / 10, 1))
+
+    def set_brightness():
+        data_v1.target_brightness = None
+        temp_display.set_brightness(data_v1)
+
+    return {'get_temp_v1': (fetch(data_v1), FETCH_RUNS),
+            'get_temp_v2': (fetch(data_v2), FETCH_RUNS),
+            'get_temp_local': (fetch(data_local), FETCH_RUNS),
+            'refresh_display': (refresh_display, RUNS),
+            'refresh_display_unchanged': (refresh_display_unchanged, RUNS),
+            'get_colour': (get_colour, RUNS),
+            'ryb2rgb': (lambda: ryb2rgb(0.3, 0.6, 0.1), RUNS),
+            'estimate_brightness': (lambda: temp_display.estimate_brightness(data_v1), RUNS),
+            'set_brightness': (set_brightness, RUNS)}
+
+
+def compare(results, filename, threshold):
+    with open(filename) as file:
+        old = json.load(file)
+
+    print(f'Compared with {old["meta"].get("commit")} ({filename}):', file=sys.stderr)
+    regressions = 0
+    for name, new_case in results['cases'].items():
+        old_case = old['cases'].get(name)
+        if old_case is None:
+            print(f'    {name:26} new', file=sys.stderr)
+            continue
+
+        change = (new_case['p50_ms'] / old_case['p50_ms'] - 1) * 100
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            regressions += 1
+        print(f'    {name:26} p50 {old_case["p50_ms"]:8.3f} -> {new_case["p50_ms"]:8.3f} ms ({change:+6.1f}%)'
+              f'   p99 {old_case["p99_ms"]:8.3f} -> {new_case["p99_ms"]:8.3f} ms{flag}', file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the display's hot paths with the matrix emulator.")
+    parser.add_argument("--output", help="Write the JSON results here instead of standard output")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="Percent a median may grow by before --compare reports it as slower. (Default: 20)")
+    args = parser.parse_args()
+
+    # The benchmark changes folder.  Resolve these first.
+    output = os.path.abspath(args.output) if args.output else None
+    previous = os.path.abspath(args.compare) if args.compare else None
+
+    logging.basicConfig(level=logging.CRITICAL)
+    temp_display.load_backend("emulator")
+
+    server, url = start_stub_server()
+    folder = make_folder('led-bench-')
+    try:
+        v1_config = write_config(folder, 'config-v1.json', url, v2=False)
+        v2_config = write_config(folder, 'config-v2.json', url, v2=True)
+        local_config = write_config(folder, 'config-local.json', url, v2=True, local=True)
+
+        os.chdir(folder)
+        data_v1 = make_data(v1_config)
+        data_v2 = make_data(v2_config)
+        data_local = make_data(local_config)
+
+        results = {'meta': {'commit': git_commit(),
+                            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                            'python': platform.python_version(),
+                            'platform': platform.platform(),
+                            'machine': platform.machine(),
+                            'backend': 'emulator'},
+                   'cases': {}}
+
+        for name, (func, runs) in cases(data_v1, data_v2, data_local).items():
+            case = time_case(func, runs)
+            case.update(trace_case(func))
+            results['cases'][name] = case
+            print(f'{name:26} p50 {case["p50_ms"]:8.3f} ms   p99 {case["p99_ms"]:8.3f} ms   '
+                  f'peak {case["alloc_peak_bytes"]:7d} B', file=sys.stderr)
+
+        results['fps'] = results['cases']['refresh_display']['per_second']
+        print(f'refresh_display could run at {results["fps"]:.0f} frames per second', file=sys.stderr)
+
+        data_v1.http.close()
+        data_v2.http.close()
+        data_local.http.close()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if previous:
+        return compare(results, previous, args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
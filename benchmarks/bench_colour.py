@@ -0,0 +1,61 @@
+# LED matrix temperature / UV display
+# Benchmark: temperature colour lookup table versus working out each colour on every call.
+#
+#   python benchmarks/bench_colour.py
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from colours import ColourTable, temp_to_colour  # noqa: E402
+
+# (really_hot, really_cold, use_Celsius) as found in config.json.sample and its Fahrenheit equivalent
+SETTINGS = [(35, -20, True), (95, -4, False)]
+CALLS = 20000
+
+
+def check_exact(table, really_hot, really_cold, use_Celsius):
+    # Every displayable temperature (one decimal place), plus some beyond the limits and off the grid
+    temps = [round(really_cold - 10 + i / 10, 1) for i in range(int((really_hot - really_cold + 20) * 10) + 1)]
+    temps += [random.uniform(really_cold - 10, really_hot + 10) for _ in range(1000)]
+
+    for t in temps:
+        expected = temp_to_colour(t, really_hot, really_cold, use_Celsius)
+        if table.lookup(t) != expected:
+            raise SystemExit(f'Mismatch at {t}: {table.lookup(t)} != {expected}')
+
+    return len(temps)
+
+
+def bench(func, temps):
+    start = time.perf_counter()
+    for t in temps:
+        func(t)
+    return (time.perf_counter() - start) / len(temps) * 1e6
+
+
+def main():
+    for really_hot, really_cold, use_Celsius in SETTINGS:
+        start = time.perf_counter()
+        table = ColourTable(really_hot, really_cold, use_Celsius)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        checked = check_exact(table, really_hot, really_cold, use_Celsius)
+
+        temps = [round(random.uniform(really_cold, really_hot), 1) for _ in range(CALLS)]
+        direct_us = bench(lambda t: temp_to_colour(t, really_hot, really_cold, use_Celsius), temps)
+        new_us = bench(table.lookup, temps)
+
+        print(f'hot={really_hot} cold={really_cold} Celsius={use_Celsius}: '
+              f'{len(table.colours)} entries built in {build_ms:.1f} ms, {checked} temperatures match exactly')
+        print(f'    per call: direct {direct_us:.2f} us, table {new_us:.2f} us ({direct_us / new_us:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# LED matrix temperature / UV display
+# Benchmark: decoding and parsing the Davis payloads.  The recorded V1 and V2 responses are parsed
+# with the observation module, with and without orjson, and compared with the sensor loop get_temp()
+# used before it.  Large accounts - many sensors on one station, many stations on one key - are
+# made up from the recorded ones.
+#
+#   python benchmarks/bench_parse.py
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import sys
+import copy
+import json
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import observation  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PAYLOADS = os.path.join(HERE, 'payloads')
+CALLS = 2000
+
+
+def read(name):
+    with open(os.path.join(PAYLOADS, name), 'rb') as file:
+        return file.read()
+
+
+def many_sensors(content, count):
+    # A station with count extra sensors (soil, leaf, air quality...) listed ahead of the console
+    payload = json.loads(content)
+    extra = payload['sensors'][0]
+    sensors = []
+    for i in range(count):
+        sensor = copy.deepcopy(extra)
+        sensor['lsid'] += 1000 + i
+        sensor['data_structure_type'] = (16, 17, 18, 19, 20)[i % 5]
+        sensors.append(sensor)
+    payload['sensors'] = sensors + payload['sensors']
+    return json.dumps(payload).encode()
+
+
+def many_stations(content, count):
+    # An account with count stations.  The one the display wants is last.
+    payload = json.loads(content)
+    wanted = payload['stations'][0]
+    stations = []
+    for i in range(count):
+        station = copy.deepcopy(wanted)
+        station['station_id'] = 1000000 + i
+        station['station_name'] = f'Station {i}'
+        stations.append(station)
+    payload['stations'] = stations + [wanted]
+    return json.dumps(payload).encode()
+
+
+def old_parse_v2(results):
+    # get_temp()'s sensor loop before the observation module, kept here for comparison
+    temp = uv = timestamp = None
+    try:
+        i = 0
+        while True:
+            keys = []
+            if results['sensors'][i]['data_structure_type'] == 23:
+                keys = ["temp", "uv_index", "ts"]
+            elif results['sensors'][i]['data_structure_type'] == 2:
+                keys = ["temp_out", "uv", "ts"]
+
+            if keys:
+                if temp is None:
+                    try:
+                        temp = results['sensors'][i]['data'][0][keys[0]]
+                        if temp is not None:
+                            timestamp = int(results['sensors'][i]['data'][0][keys[2]])
+                    except KeyError:
+                        pass
+
+                if uv is None:
+                    try:
+                        uv = results['sensors'][i]['data'][0][keys[1]]
+                        if uv is not None and timestamp is None:
+                            timestamp = int(results['sensors'][i]['data'][0][keys[2]])
+                    except KeyError:
+                        pass
+
+            i += 1
+    except IndexError:
+        pass
+    return temp, uv, timestamp
+
+
+def bench(func, content):
+    func(content)
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func(content)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main():
+    v1 = read('v1_noaa_ext.json')
+    v2 = read('v2_current.json')
+    stations = read('v2_stations.json')
+
+    # Both parsers must agree before either is timed
+    for content in (v2, many_sensors(v2, 200)):
+        new = observation.parse_v2(json.loads(content))
+        old = old_parse_v2(json.loads(content))
+        if (new.temp, new.uv, new.observed_at) != old:
+            raise SystemExit(f'Parsers disagree: {new} != {old}')
+
+    decoders = [('json', json.loads)]
+    if orjson is not None:
+        decoders.append(('orjson', orjson.loads))
+    else:
+        print('orjson is not installed.  Only the json module is timed.\n')
+
+    cases = [('v1 NoaaExt', v1, observation.parse_v1, None),
+             ('v2 current', v2, observation.parse_v2, old_parse_v2),
+             ('v2 current, 200 sensors', many_sensors(v2, 200), observation.parse_v2, old_parse_v2),
+             ('v2 stations', stations,
+              lambda results: observation.find_station(results, 'Cadence at The Lakes'), None),
+             ('v2 stations, 500 on account', many_stations(stations, 500),
+              lambda results: observation.find_station(results, 'Cadence at The Lakes'), None)]
+
+    print(f'Microseconds per payload, mean of {CALLS} calls:')
+    print(f'    {"":30} {"bytes":>7} {"decoder":>8} {"decode":>8} {"parse":>8} {"old loop":>9} {"total":>8}')
+    for name, content, parse, old in cases:
+        for decoder, loads in decoders:
+            results = loads(content)
+            decode_us = bench(loads, content)
+            parse_us = bench(parse, results)
+            old_us = f'{bench(old, results):9.1f}' if old is not None else f'{"":9}'
+            print(f'    {name:30} {len(content):7} {decoder:>8} {decode_us:8.1f} {parse_us:8.1f} {old_us} '
+                  f'{decode_us + parse_us:8.1f}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
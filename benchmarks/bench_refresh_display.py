@@ -0,0 +1,86 @@
+# LED matrix temperature / UV display
+# Micro-benchmark of refresh_display(): measuring text by drawing it on the canvas (the old way)
+# versus the cached glyph widths.  Run from the LED_matrix folder, on the Pi or with the emulator:
+#
+#   sudo python benchmarks/bench_refresh_display.py
+#   python benchmarks/bench_refresh_display.py --backend=emulator
+#
+# Uses config.json if there is one, otherwise config.json.sample.  Runs in a temporary folder so the
+# history and station ID files the display writes don't touch the real ones.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import sys
+import time
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import temp_display  # noqa: E402
+from bench import make_folder  # noqa: E402
+
+RUNS = 500
+
+
+class DrawToMeasure:
+    # How refresh_display used to measure text: draw it at (0, 0) and use the returned width.
+    def __init__(self, data):
+        self.data = data
+        self.fonts = {}  # glyph atlas -> the full font it was built from
+
+    def width(self, font, text):
+        full = self.fonts.get(font)
+        if full is None:
+            full = self.fonts[font] = temp_display.graphics.Font()
+            full.LoadFont(font.filename)
+        return temp_display.graphics.DrawText(self.data.canvas, full, 0, 0, self.data.title_color, text)
+
+
+def bench(data, runs):
+    times = []
+    for i in range(runs):
+        # Alternate between the two right hand panes like the display does
+        data.show_hi_lo_temp = i % 2 == 0
+        start = time.perf_counter()
+        temp_display.refresh_display(data)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000, times[int(len(times) * 0.95)] * 1000
+
+
+def main():
+    commandArgs = temp_display.args()
+    temp_display.load_backend(commandArgs.backend)
+    matrix = temp_display.RGBMatrix(options=temp_display.led_matrix_options(commandArgs))
+
+    config = temp_display.Config(os.path.abspath("config.json" if os.path.isfile("config.json") else "config.json.sample"))
+    folder = make_folder('led-refresh-')
+    os.chdir(folder)
+    try:
+        data = temp_display.Data(config, matrix)
+        run(data)
+        data.history.close()
+    finally:
+        os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def run(data):
+    data.temp_now, data.temp_high, data.temp_low, data.UV = 23.4, 28.1, 12.7, 6.2
+
+    cached = data.text_extents
+    data.text_extents = DrawToMeasure(data)
+    before = bench(data, RUNS)
+
+    data.text_extents = cached
+    after = bench(data, RUNS)
+
+    print(f'refresh_display over {RUNS} runs (median / p95):')
+    print(f'    draw to measure: {before[0]:.3f} / {before[1]:.3f} ms')
+    print(f'    cached widths:   {after[0]:.3f} / {after[1]:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# LED matrix temperature / UV display
+# Cold start to first frame, with and without the compiled font cache.  Each run is a fresh Python
+# process that imports the display, loads the config and fonts and draws one frame on the emulator.
+# Run from the LED_matrix folder:
+#
+#   python benchmarks/bench_startup.py
+#
+# "bdf" parses the BDF files (and writes the cache, as the first start does).  "cache" maps the
+# cache in, as every later start does.  Each run is in a temporary folder, so neither your own
+# fonts/cache folder nor your history file is touched.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RUNS = 5
+
+
+def child(cache_folder):
+    # Runs in the fresh process, in the temporary folder.  Prints the monotonic clock at each step,
+    # which is shared with the parent.
+    steps = {}
+    sys.path.insert(0, os.path.join(HERE, '..'))
+    os.chdir(cache_folder)
+
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    import temp_display
+    import glyph_atlas
+    glyph_atlas.CACHE_FOLDER = cache_folder
+    steps['imported'] = time.monotonic()
+
+    temp_display.load_backend("emulator")
+    options = temp_display.RGBMatrixOptions()
+    options.rows, options.cols, options.chain_length = 32, 64, 2
+    matrix = temp_display.RGBMatrix(options=options)
+
+    jdata = json.load(open(os.path.join(HERE, '..', 'config.json.sample')))
+    jdata["dimmer"]["use_sensor"] = False
+    config_file = os.path.join(cache_folder, "config.json")
+    with open(config_file, "w") as file:
+        json.dump(jdata, file)
+
+    data = temp_display.Data(temp_display.Config(config_file), matrix)
+    steps['data'] = time.monotonic()
+
+    data.temp_now, data.temp_high, data.temp_low = 23.4, 28.1, 12.7
+    data.show_hi_lo_temp = True
+    temp_display.refresh_display(data)
+    steps['first_frame'] = time.monotonic()
+
+    print(json.dumps(steps))
+
+
+def run_once(cache_folder):
+    start = time.monotonic()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', cache_folder],
+                         capture_output=True, text=True, check=True).stdout
+    steps = json.loads(out.splitlines()[-1])
+    return {name: t - start for name, t in steps.items()}
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time cold start to first frame.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child)
+
+    from bench import make_folder  # not in the child, where importing it would be timed
+
+    results = {}
+    for mode in ('bdf', 'cache'):
+        runs = []
+        for _ in range(RUNS):
+            folder = make_folder('led-fonts-')
+            try:
+                if mode == 'cache':
+                    run_once(folder)  # builds the cache
+                runs.append(run_once(folder))
+            finally:
+                shutil.rmtree(folder, ignore_errors=True)
+        results[mode] = {name: median([r[name] for r in runs]) for name in runs[0]}
+
+    print(f'Start to first frame, median of {RUNS} runs (seconds since the process was started):')
+    print(f'    {"":8} {"imported":>9} {"data":>9} {"frame":>9}')
+    for mode, steps in results.items():
+        print(f'    {mode:8} {steps["imported"]:9.3f} {steps["data"]:9.3f} {steps["first_frame"]:9.3f}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# LED matrix temperature / UV display
+# Soak test.  Runs the display's whole schedule of jobs (weather polling, the main loop, brightness
+# and the IoT reports) against the matrix emulator and the stub Davis server on a simulated clock,
+# so a month of running takes minutes.  Looks for the kind of slow leak the response.close() calls
+# were added to stop.
+#
+# Every few simulated hours it records the resident memory, the memory traced by tracemalloc, open
+# files and threads (by name, so a chain of timers or request threads that keeps growing shows up).
+# Growth is counted from the first measurement after two warm-up days, by which time the display's
+# caches have settled.  Allocation sites are snapshotted then and at the end, and those that grew
+# the most are listed.  The exit status is 1 if resident memory grew by more than --max-rss-growth MB
+# or more than --max-thread-growth threads were left running.
+#
+# Before resident memory is read, glibc is asked to hand its free memory back (malloc_trim).
+# Otherwise it keeps what the display and the tracemalloc snapshots freed for reuse, and resident
+# memory wanders by a few MB from one measurement to the next with no leak at all.
+# Run from the LED_matrix folder:
+#
+#   python benchmarks/soak.py --days 30
+#   python benchmarks/soak.py --days 7 --source local --output soak.json
+#
+# Only the scheduler takes the clock as a parameter.  Everything else reads the time module and
+# datetime.now(), which are replaced while the test runs.  The stub server runs in this process so it
+# sees the same clock.  The network watchdog is not started: its thread waits on the real clock.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import gc
+import os
+import ctypes
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import psutil
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import temp_display  # noqa: E402
+import suntimes  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+from bench import make_folder, write_config, make_data  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+DAY = 24 * 60 * 60
+
+try:
+    malloc_trim = ctypes.CDLL(None).malloc_trim
+except (OSError, AttributeError, TypeError):
+    malloc_trim = None  # not glibc.  Resident memory includes whatever the allocator keeps.
+
+# tracemalloc's own bookkeeping, the import system and this script are not the display's
+TRACE_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),
+                 tracemalloc.Filter(False, __file__),
+                 tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                 tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+                 tracemalloc.Filter(False, '<unknown>'))
+
+
+class SimulatedClock:
+    # Wall clock and monotonic time in one.  Time only moves when the scheduler sleeps, so jobs run
+    # back to back however far apart they are due.
+    def __init__(self, start):
+        self.now = start
+        self._saved = None
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def install(self):
+        clock = self
+
+        class SimulatedDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.now, tz)
+
+        self._saved = (time.time, time.monotonic, temp_display.datetime, suntimes.datetime)
+        time.time = time.monotonic = self.time
+        temp_display.datetime = suntimes.datetime = SimulatedDatetime
+
+    def uninstall(self):
+        time.time, time.monotonic, temp_display.datetime, suntimes.datetime = self._saved
+
+
+def thread_names():
+    # Running threads by name, numbers taken out so Thread-7 and Thread-12 count together
+    return Counter(re.sub(r'\d+', 'N', thread.name) for thread in threading.enumerate())
+
+
+class Soak:
+    def __init__(self, data, clock, server, started, warmup_until):
+        self.data = data
+        self.clock = clock
+        self.server = server
+        self.started = started  # simulated start time
+        self.warmup_until = warmup_until
+        self.process = psutil.Process()
+        self.samples = []
+        self.first = None  # the first sample after the warm-up
+        self.baseline = None  # (file, line) -> (bytes, blocks) at that sample
+        self.sites = None  # the same at the end
+
+    def measure(self, last=False):
+        self.server.telemetry.clear()  # the stub server keeps every upload.  Not the display's memory.
+        gc.collect()
+
+        # The baseline's sites are held from now on so they are counted in every measurement from this
+        # one.  The last ones are taken after the last measurement so they are counted in none.
+        baseline = self.first is None and self.clock.now >= self.warmup_until
+        if baseline:
+            self.baseline = self._sites()
+            gc.collect()  # what is left of the snapshot
+        if malloc_trim is not None:
+            malloc_trim(0)
+
+        try:
+            files = self.process.num_fds()
+        except AttributeError:  # Windows has no file descriptors to count
+            files = None
+
+        http = self.data.http.stats()
+        sample = {'day': round((self.clock.now - self.started) / DAY, 2),
+                  'rss_bytes': self.process.memory_info().rss,
+                  'traced_bytes': tracemalloc.get_traced_memory()[0],
+                  'tracemalloc_bytes': tracemalloc.get_tracemalloc_memory(),
+                  'open_files': files,
+                  'threads': dict(thread_names()),
+                  'requests': sum(s['count'] + s['errors'] for s in http.values()),
+                  'frames': sum(self.data.frame_state.stats().values()),
+                  'history_records': self.data.history.written,
+                  'warmup': self.clock.now < self.warmup_until}
+        self.samples.append(sample)
+        if baseline:
+            self.first = sample
+        if last:
+            self.sites = self._sites()
+
+        first = self.first or self.samples[0]
+        print(f'day {sample["day"]:6.2f}  rss {sample["rss_bytes"] / 2**20:7.1f} MB '
+              f'({(sample["rss_bytes"] - first["rss_bytes"]) / 2**20:+6.1f})  '
+              f'traced {sample["traced_bytes"] / 2**20:6.2f} MB '
+              f'({(sample["traced_bytes"] - first["traced_bytes"]) / 2**20:+6.2f})  '
+              f'threads {sum(sample["threads"].values()):3d}  files {sample["open_files"]}  '
+              f'requests {sample["requests"]}  frames {sample["frames"]}{"  warm-up" if sample["warmup"] else ""}',
+              file=sys.stderr)
+
+    def _sites(self):
+        # (file, line) -> (bytes, blocks).  Only the totals per site are kept.  Holding whole snapshots
+        # would itself grow the memory measured.
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        return {(stat.traceback[0].filename, stat.traceback[0].lineno): (stat.size, stat.count)
+                for stat in snapshot.statistics('lineno')}
+
+    def growth(self, top):
+        # The allocation sites that grew the most since the warm-up
+        sites = []
+        for (filename, lineno), (size, count) in self.sites.items():
+            size_before, count_before = self.baseline.get((filename, lineno), (0, 0))
+            if size > size_before:
+                sites.append({'site': f'{filename}:{lineno}',
+                              'size_diff_bytes': size - size_before,
+                              'count_diff': count - count_before,
+                              'size_bytes': size})
+        sites.sort(key=lambda site: site['size_diff_bytes'], reverse=True)
+        return sites[:top]
+
+
+def soak_config(folder, url, source):
+    # Like the benchmark's, with the IoT reports going to the stub server as well
+    filename = write_config(folder, 'config.json', url, v2=source != 'v1', local=source == 'local')
+    with open(filename) as file:
+        jdata = json.load(file)
+    jdata["adafruit_IO"]["url"] = url
+    with open(filename, "w") as file:
+        json.dump(jdata, file)
+    return filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the display for days on a simulated clock and look for leaks.")
+    parser.add_argument("--days", type=float, default=30, help="Simulated days to run for. (Default: 30)")
+    parser.add_argument("--source", choices=('v1', 'v2', 'local'), default='v2',
+                        help="Where the weather comes from. (Default: v2)")
+    parser.add_argument("--warmup-hours", type=float, default=48,
+                        help="Simulated hours before the first measurement. (Default: 48)")
+    parser.add_argument("--interval-hours", type=float, default=12,
+                        help="Simulated hours between measurements. (Default: 12)")
+    parser.add_argument("--max-rss-growth", type=float, default=1.0,
+                        help="MB resident memory may grow by after the warm-up. (Default: 1)")
+    parser.add_argument("--max-thread-growth", type=int, default=2,
+                        help="Threads that may be added after the warm-up. (Default: 2)")
+    parser.add_argument("--top", type=int, default=15, help="Allocation sites to list. (Default: 15)")
+    parser.add_argument("--output", help="Also write the results here as JSON")
+    args = parser.parse_args()
+
+    if args.days * 24 <= args.warmup_hours:
+        parser.error('--days must be longer than the warm-up')
+    output = os.path.abspath(args.output) if args.output else None
+
+    logging.basicConfig(level=logging.CRITICAL)
+    temp_display.load_backend("emulator")
+
+    server = StubServer(quiet=True)
+    threading.Thread(target=server.serve_forever, name='stub_server', daemon=True).start()
+    folder = make_folder('led-soak-')
+    config = soak_config(folder, server.url, args.source)
+    os.chdir(folder)
+
+    clock = SimulatedClock(time.time())
+    clock.install()
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    try:
+        data = make_data(config)
+        data.scheduler = Scheduler(clock.time, clock.sleep)
+        temp_display.schedule_jobs(data)
+
+        soak = Soak(data, clock, server, clock.now, clock.now + args.warmup_hours * 3600)
+        data.scheduler.add_job('soak_measure', args.interval_hours * 3600, soak.measure, budget=60)
+        data.scheduler.call_later('soak_end', args.days * DAY, data.scheduler.stop)
+        data.scheduler.run()
+        soak.measure(last=True)
+
+        if data.telemetry is not None:
+            data.telemetry.stop()
+        data.history.close()
+        data.http.close()
+    finally:
+        tracemalloc.stop()
+        clock.uninstall()
+        server.shutdown()
+        server.server_close()
+        os.chdir(os.path.join(HERE, '..'))
+        shutil.rmtree(folder, ignore_errors=True)
+
+    first, last = soak.first, soak.samples[-1]
+    rss_growth = (last['rss_bytes'] - first['rss_bytes']) / 2**20
+    thread_growth = sum(last['threads'].values()) - sum(first['threads'].values())
+    sites = soak.growth(args.top)
+
+    print(f'\n{args.days:g} simulated days in {time.perf_counter() - wall_start:.0f} seconds.  '
+          f'Growth since the warm-up:', file=sys.stderr)
+    for site in sites:
+        print(f'    {site["size_diff_bytes"] / 1024:+9.1f} KiB {site["count_diff"]:+7d} blocks  {site["site"]}',
+              file=sys.stderr)
+    for name, count in sorted(last['threads'].items()):
+        before = first['threads'].get(name, 0)
+        if count != before:
+            print(f'    threads "{name}": {before} -> {count}', file=sys.stderr)
+
+    failures = []
+    if rss_growth > args.max_rss_growth:
+        failures.append(f'resident memory grew by {rss_growth:.1f} MB (limit {args.max_rss_growth:g})')
+    if thread_growth > args.max_thread_growth:
+        failures.append(f'{thread_growth} more threads (limit {args.max_thread_growth})')
+    print('FAILED: ' + ', '.join(failures) if failures else f'Passed.  Resident memory grew by {rss_growth:.1f} MB.',
+          file=sys.stderr)
+
+    if output:
+        with open(output, "w") as file:
+            json.dump({'days': args.days, 'source': args.source, 'samples': soak.samples,
+                       'growth': sites, 'failures': failures}, file, indent=2)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# LED matrix temperature / UV display
+# Local stand-in for the Davis WeatherLink server.  Replays the recorded responses in
+# benchmarks/payloads so get_temp() can be timed (or tried out) without a network or an account.
+# Point a config file at it with "weatherlink_url" in its network section.
+#
+# It also stands in for a WeatherLink Live on the local network.  Set "host" in the
+# davis_weatherlink_live_interface section to the server's address and port, e.g. 127.0.0.1:8080.
+# While the file named by --local-down exists it answers those requests with HTTP 503, to try out
+# falling back to the Davis server.
+#
+# It also accepts Adafruit IO feed uploads and prints the values.  Set "url" in the adafruit_IO
+# section to send the telemetry here.
+#
+#   python benchmarks/stub_server.py --port 8080
+#
+# With --port 0 a free port is picked.  The first line printed is always the server's URL.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+
+# Observation timestamp in the recorded V2 current and WeatherLink Live responses.  Replaced on each
+# request so the display does not treat the data as outdated.  The WeatherLink Live gets "now".  V2
+# gets the last 15 minute mark, as a free-tier station only uploads then, so the display's adaptive
+# polling sees the same observation until the next one is due.
+RECORDED_TS = b'1792199400'
+
+# How often the V2 observation changes, seconds
+V2_UPDATE_INTERVAL = 15 * 60
+
+
+def read_payload(name):
+    with open(os.path.join(PAYLOADS, name), 'rb') as file:
+        return file.read()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, the same as the real server
+
+    # Headers and body go out in separate writes.  Without this the body waits on a delayed ACK
+    # and every request takes an extra 40 ms.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = self.path.partition('?')[0]
+
+        if path == '/v1/NoaaExt.json':
+            body = self.server.payloads['v1_noaa_ext.json']
+        elif path == '/v2/stations':
+            body = self.server.payloads['v2_stations.json']
+        elif path.startswith('/v2/current/'):
+            body = self.server.payloads['v2_current.json'].replace(RECORDED_TS, str(int(time.time()) // V2_UPDATE_INTERVAL * V2_UPDATE_INTERVAL).encode())
+        elif path == '/v1/current_conditions':
+            if self.server.local_down and os.path.exists(self.server.local_down):
+                self.send_error(503)
+                return
+            body = self.server.payloads['wll_current_conditions.json'].replace(RECORDED_TS, str(int(time.time())).encode())
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # Adafruit IO feed batch uploads, e.g. /api/v2/<user>/feeds/<feed>/data/batch
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        parts = self.path.partition('?')[0].split('/')
+        if len(parts) != 8 or parts[1:3] != ['api', 'v2'] or parts[4] != 'feeds' or parts[6:] != ['data', 'batch']:
+            self.send_error(404)
+            return
+
+        values = json.loads(body)['data']
+        self.server.telemetry.setdefault(parts[5], []).extend(values)
+        if not self.server.quiet:
+            print(f'{parts[5]}: {", ".join(str(v["value"]) for v in values)}', flush=True)
+
+        reply = json.dumps([{'feed_key': parts[5], 'value': v['value']} for v in values]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, local_down=None, quiet=False):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.local_down = local_down
+        self.quiet = quiet  # don't print the telemetry values
+        self.payloads = {name: read_payload(name) for name in os.listdir(PAYLOADS) if name.endswith('.json')}
+        self.telemetry = {}  # feed key -> values uploaded to it
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Davis WeatherLink responses.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--local-down", help="While this file exists, the WeatherLink Live stand-in answers with errors.")
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.local_down)
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
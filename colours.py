@@ -0,0 +1,115 @@
+# LED matrix temperature / UV display
+# Temperature to RGB colours.  The colour for every 0.1 degree step between really_cold and
+# really_hot is worked out once and then looked up, instead of running the HSV / RYB maths
+# on every refresh.  Also the UV Index colours.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import bisect
+import colorsys
+
+import numpy as np
+
+import ryb2rgb
+
+# Table resolution.  Temperatures are displayed to one decimal place.
+STEPS_PER_DEGREE = 10
+
+# Environment Canada UV Index colours: low - green, moderate - yellow, high - orange, very high - red
+# and extreme - purple.  Each level is where the next colour starts.
+UV_LEVELS = (3.0, 6.0, 8.0, 11.0)
+UV_COLOURS = ((79, 179, 0), (253, 205, 0), (255, 102, 0), (255, 0, 0), (206, 49, 254))
+UV_COLOUR_ARRAY = np.array(UV_COLOURS, dtype=np.uint8)
+
+
+def uv_colour(uv):
+    return UV_COLOURS[bisect.bisect_right(UV_LEVELS, uv)]
+
+
+def uv_colour_array(uvs):
+    # Colours for a whole array of UV readings at once, as an (n, 3) uint8 array
+    return UV_COLOUR_ARRAY[np.searchsorted(UV_LEVELS, uvs, side='right')]
+
+
+def temp_to_ryb(temp, really_hot, really_cold, use_Celsius):
+
+    # cap out at the max temps allowed
+    if temp > really_hot:
+        temp = really_hot
+    elif temp < really_cold:
+        temp = really_cold
+
+    # Anything below freezing will be blue or purple
+    # If using that other scale, must convert to Celsius to make this work
+    if not use_Celsius:
+        temp = (temp - 32) * 5 / 9
+        really_hot = (really_hot - 32) * 5 / 9
+        really_cold = (really_cold - 32) * 5 / 9
+
+    if temp >= 0:
+        full_range = really_hot
+        z = (really_hot - temp) / full_range * 210  # 0 - 210
+    else:
+        full_range = -really_cold
+        z = (-temp) / full_range * 90 + 210  # 210 - 300
+
+    # Convert degrees (of a circle) to the RYB colour wheel
+    # RYB colour wheel provides best rainbow of colours
+    r, yellow, b = colorsys.hsv_to_rgb(z / 360.0, 1.0, 1.0)
+
+    return int(255 * r), int(255 * yellow), int(255 * b)
+
+
+def temp_to_colour(temp, really_hot, really_cold, use_Celsius):
+
+    R, Y, B = temp_to_ryb(temp, really_hot, really_cold, use_Celsius)
+
+    # Convert RYB to RGB
+    R, G, B = ryb2rgb.ryb2rgb(R, Y, B)
+
+    return (R, G, B)
+
+
+class ColourTable:
+    def __init__(self, really_hot, really_cold, use_Celsius):
+        # The settings this table was built from.  Compared on lookup so a config change forces a rebuild.
+        self.key = (really_hot, really_cold, use_Celsius)
+        self.really_hot = really_hot
+        self.really_cold = really_cold
+
+        # Grid temperatures are rounded to one decimal so they are the exact same floats as the
+        # temperatures parsed from the Davis data (e.g. 23.3, not 23.299999999999997).
+        steps = int(round((really_hot - really_cold) * STEPS_PER_DEGREE))
+        self.temps = [round(really_cold + i / STEPS_PER_DEGREE, 1) for i in range(steps + 1)]
+
+        # The RYB to RGB step is done for the whole table in one vectorized call.
+        # The last two rows are the colours used beyond the limits.
+        ryb = [temp_to_ryb(t, really_hot, really_cold, use_Celsius) for t in self.temps + [really_hot, really_cold]]
+        rgb = ryb2rgb.ryb2rgb_batch(ryb).tolist()
+        self.colours = [tuple(c) for c in rgb[:-2]]
+        self.hot_colour = tuple(rgb[-2])
+        self.cold_colour = tuple(rgb[-1])
+
+        # The same table for lookup_array().  The first and last rows are also the colours beyond the limits.
+        self.colour_array = np.array(self.colours, dtype=np.uint8)
+
+    def lookup(self, temp):
+        # Beyond the limits the colour stays at its max
+        if temp >= self.really_hot:
+            return self.hot_colour
+        if temp <= self.really_cold:
+            return self.cold_colour
+
+        i = int(round((temp - self.really_cold) * STEPS_PER_DEGREE))
+        if self.temps[i] == temp:
+            return self.colours[i]
+
+        # Not on the 0.1 degree grid.  Work it out the long way so the result is always exact.
+        return temp_to_colour(temp, *self.key)
+
+    def lookup_array(self, temps):
+        # Colours for a whole array of temperatures at once, as an (n, 3) uint8 array.  Rounded to the
+        # 0.1 degree grid, which is as fine as anything shown.  NaN gets the cold colour.
+        steps = np.rint((np.nan_to_num(temps, nan=self.really_cold) - self.really_cold) * STEPS_PER_DEGREE)
+        return self.colour_array[steps.clip(0, len(self.colours) - 1).astype(np.intp)]
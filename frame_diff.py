@@ -0,0 +1,70 @@
+# LED matrix temperature / UV display
+# Frame diffing.  Remembers what the canvas was last drawn from (strings, colours, mode and
+# brightness) so a frame that would come out the same is neither redrawn nor swapped, and a change
+# that only touches the right hand pane (high / low or UV) only redraws that pane.
+#
+# This relies on the display always drawing into the same canvas, so it still holds the last frame.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import logging
+
+# What update() says needs drawing
+SKIP = 0  # nothing changed
+FULL = 1  # clear and draw the whole frame
+RIGHT_PANE = 2  # clear from clear_from to the right edge and draw the right pane only
+
+
+class FrameState:
+    def __init__(self):
+        self.invalidate()
+
+        # statistics
+        self.skipped = 0
+        self.full = 0
+        self.partial = 0
+
+    def invalidate(self):
+        # Something else drew on the canvas (the after hours cursor).  The next frame is drawn in full.
+        self._screen = None  # what is showing and at which brightness, e.g. ('weather', 80)
+        self._left = None  # inputs the left pane was drawn from
+        self._right = None  # and the right pane
+        self._right_start = 0  # first column the right pane was drawn in
+        self.clear_from = 0
+
+    def update(self, screen, left, right=None, left_end=0, right_start=0):
+        # Records the inputs of the frame about to be drawn and returns SKIP, FULL or RIGHT_PANE.
+        # left_end is the first column right of everything in the left pane and right_start the first
+        # column of the new right pane.  Colours must be given as tuples, not graphics.Color.
+        if screen == self._screen and left == self._left:
+            if right == self._right:
+                self.skipped += 1
+                return SKIP
+
+            # Clear wherever the old or new right pane is.  If that would cut into the left pane,
+            # it is simpler to draw everything.
+            clear_from = min(self._right_start, right_start)
+            if clear_from >= left_end:
+                self._right = right
+                self._right_start = right_start
+                self.clear_from = clear_from
+                self.partial += 1
+                return RIGHT_PANE
+
+        self._screen = screen
+        self._left = left
+        self._right = right
+        self._right_start = right_start
+        self.clear_from = 0
+        self.full += 1
+        return FULL
+
+    def stats(self):
+        return {'skipped': self.skipped,
+                'full': self.full,
+                'partial': self.partial}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('Frames skipped:%d full redraws:%d right pane redraws:%d', s['skipped'], s['full'], s['partial'])
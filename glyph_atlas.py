@@ -0,0 +1,252 @@
+# LED matrix temperature / UV display
+# Glyph atlas.  The characters the display draws are rendered once at startup into one packed
+# coverage bitmap per font.  Each refresh then composes the whole frame in NumPy - glyphs copied out
+# of the atlas, coloured by a per-pixel tint - and pushes it to the canvas with a single SetImage
+# instead of drawing every string glyph by glyph.
+#
+# Coverage is 0 - 255 rather than on / off, so anti-aliased glyphs, and gradient colours through
+# the tint, would cost nothing extra per frame.
+#
+# Each atlas is compiled into a small binary cache (fonts/cache/*.atlas) the first time it is
+# built and memory mapped on later starts, so the BDF files are only parsed again if they change.
+# To build the caches ahead of time (run from the LED_matrix folder):
+#
+#   python glyph_atlas.py
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import sys
+import json
+import struct
+import logging
+import argparse
+
+import numpy as np
+from PIL import Image
+
+import bdf
+
+# Everything refresh_display() draws: temperatures, UV and the two titles
+CHARACTERS = "0123456789.- High-LowUV"
+
+# Error and status messages can be any printable ASCII
+MESSAGE_CHARACTERS = ''.join(chr(c) for c in range(32, 127))
+
+# The fonts the display uses and the characters it needs from each
+DISPLAY_FONTS = {"./fonts/4x6.bdf": CHARACTERS,
+                 "./fonts/8x13B.bdf": CHARACTERS,
+                 "./fonts/Helvetica38.bdf": CHARACTERS,
+                 "./fonts/7x13.bdf": MESSAGE_CHARACTERS}
+
+# Compiled atlases are kept in this folder next to the fonts.  Start of each cache file.
+CACHE_FOLDER = "cache"
+MAGIC = b'LEDATLS1'
+
+# The library draws this glyph in place of any character the font does not have
+REPLACEMENT_CHARACTER = 0xFFFD
+
+
+class FontAtlas:
+    def __init__(self, filename, height, baseline, coverage, glyphs):
+        self.filename = filename
+        self.height = height
+        self.baseline = baseline
+        self.coverage = coverage  # glyphs side by side, each as wide as its ink and as tall as the font
+        self._glyphs = glyphs  # codepoint -> (first column in coverage, ink width, x offset, advance)
+
+    def _find(self, codepoint):
+        glyph = self._glyphs.get(codepoint)
+        if glyph is None:
+            glyph = self._glyphs.get(REPLACEMENT_CHARACTER)
+        return glyph
+
+    def CharacterWidth(self, codepoint):
+        # Same as graphics.Font.CharacterWidth so TextExtents can measure with an atlas
+        glyph = self._glyphs.get(codepoint)
+        return glyph[3] if glyph is not None else -1
+
+
+def render(filename, font, characters=CHARACTERS):
+    # Builds the atlas for characters from a parsed BDF font
+    codepoints = sorted({ord(c) for c in characters} | {REPLACEMENT_CHARACTER})
+    found = [font.glyph(cp) for cp in codepoints]
+    found = [g for g in found if g is not None]
+
+    coverage = np.zeros((font.height, sum(g.width for g in found)), dtype=np.uint8)
+    glyphs = {}
+
+    column = 0
+    for g in found:
+        if g.width and g.rows:
+            # Rows are ints, bit (width - 1) is the left-most pixel
+            rows = np.array(g.rows, dtype=object)[:, None] >> np.arange(g.width - 1, -1, -1)
+            bits = (rows & 1).astype(np.uint8) * 255
+
+            top = font.baseline - g.height - g.y_offset
+            y0, y1 = max(0, top), min(font.height, top + g.height)
+            coverage[y0:y1, column:column + g.width] = bits[y0 - top:y1 - top]
+
+        glyphs[g.codepoint] = (column, g.width, g.x_offset, g.device_width)
+        column += g.width
+
+    return FontAtlas(filename, font.height, font.baseline, coverage, glyphs)
+
+
+def cache_file(filename):
+    # fonts/Helvetica38.bdf is cached as fonts/cache/Helvetica38.atlas
+    folder, name = os.path.split(filename)
+    return os.path.join(folder, CACHE_FOLDER, os.path.splitext(name)[0] + '.atlas')
+
+
+def _source_key(filename, characters):
+    # A cache is only used if it was built from this exact font file, for these characters
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'characters': characters}
+
+
+def write_cache(atlas, characters):
+    # Cache file layout: MAGIC, JSON header length (4 bytes, little endian), JSON header, padding to a
+    # multiple of 16 bytes, then the coverage bitmap row by row.
+    header = json.dumps({'source': _source_key(atlas.filename, characters),
+                         'height': atlas.height,
+                         'baseline': atlas.baseline,
+                         'width': atlas.coverage.shape[1],
+                         'glyphs': atlas._glyphs}).encode()
+    start = len(MAGIC) + 4 + len(header)
+    padding = -start % 16
+
+    filename = cache_file(atlas.filename)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    # Written under a temporary name and renamed so a half written cache is never read
+    with open(filename + '.tmp', 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<I', len(header)))
+        file.write(header)
+        file.write(b'\0' * padding)
+        file.write(np.ascontiguousarray(atlas.coverage).tobytes())
+    os.replace(filename + '.tmp', filename)
+
+
+def read_cache(filename, characters):
+    # The atlas from the cache, or None if there is no cache or it is out of date
+    try:
+        with open(cache_file(filename), 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                return None
+            length, = struct.unpack('<I', file.read(4))
+            header = json.loads(file.read(length))
+
+        if header['source'] != _source_key(filename, characters):
+            return None
+
+        start = len(MAGIC) + 4 + length
+        start += -start % 16
+        coverage = np.memmap(cache_file(filename), dtype=np.uint8, mode='r', offset=start,
+                             shape=(header['height'], header['width']))
+
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    glyphs = {int(cp): tuple(glyph) for cp, glyph in header['glyphs'].items()}
+    return FontAtlas(filename, header['height'], header['baseline'], coverage, glyphs)
+
+
+def load(filename, characters=CHARACTERS, use_cache=True):
+    # The atlas for characters in a BDF font.  Parsing a large BDF file is slow (Helvetica38 is over
+    # 100k lines) so the result is cached and later starts map the cache in instead.
+    if use_cache:
+        atlas = read_cache(filename, characters)
+        if atlas is not None:
+            return atlas
+
+    atlas = render(filename, bdf.load(filename, {ord(c) for c in characters} | {REPLACEMENT_CHARACTER}),
+                   characters)
+
+    if use_cache:
+        try:
+            write_cache(atlas, characters)
+        except OSError as err:
+            logging.warning('Could not write font cache for %s: %s', filename, err)
+
+    return atlas
+
+
+class FrameComposer:
+    # The frame being put together.  Coverage says how much of each pixel is lit and tint what
+    # colour it is lit in.
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.coverage = np.zeros((height, width), dtype=np.uint8)
+        self.tint = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def clear(self, x=0):
+        # Blank from column x to the right edge
+        self.coverage[:, x:] = 0
+        self.tint[:, x:] = 0
+
+    def draw_text(self, atlas, x, y, rgb, text):
+        # Like graphics.DrawText: y is the baseline and the width drawn is returned.
+        x = int(x)
+        start = x
+        top = int(y) - atlas.baseline
+
+        y0, y1 = max(0, top), min(self.height, top + atlas.height)
+        if y0 >= y1:
+            return sum(atlas.CharacterWidth(ord(c)) for c in text)
+
+        for char in text:
+            glyph = atlas._find(ord(char))
+            if glyph is None:
+                continue
+
+            column, width, x_offset, advance = glyph
+            left = x + x_offset
+            x0, x1 = max(0, left), min(self.width, left + width)
+            if x0 < x1:
+                cell = atlas.coverage[y0 - top:y1 - top, column + x0 - left:column + x1 - left]
+                lit = cell > 0
+                np.maximum(self.coverage[y0:y1, x0:x1], cell, out=self.coverage[y0:y1, x0:x1])
+                self.tint[y0:y1, x0:x1][lit] = rgb
+            x += advance
+
+        return x - start
+
+    def draw_columns(self, x, top, rows, heights, rgb, fill=64):
+        # A bar chart in the band of rows starting at top: column i is lit from the bottom of the band
+        # up heights[i] pixels more, the top pixel at full brightness and the rest at fill.  Columns
+        # with a negative height are left blank.  rgb has one colour per column.
+        heights = np.asarray(heights)[:max(0, self.width - x)]
+        rgb = np.asarray(rgb, dtype=np.uint8)[:len(heights)]
+        level = np.arange(rows - 1, -1, -1)[:, None]  # 0 on the bottom row
+        lit = level <= heights
+        cell = np.where(level == heights, 255, np.where(lit, fill, 0)).astype(np.uint8)
+
+        coverage = self.coverage[top:top + rows, x:x + len(heights)]
+        np.maximum(coverage, cell, out=coverage)
+        tint = self.tint[top:top + rows, x:x + len(heights)]
+        np.copyto(tint, np.broadcast_to(rgb, tint.shape), where=lit[:, :, None])
+
+    def image(self, x=0):
+        # The frame from column x to the right edge, ready for canvas.SetImage()
+        pixels = self.coverage[:, x:, None].astype(np.uint16) * self.tint[:, x:] // 255
+        return Image.fromarray(pixels.astype(np.uint8), 'RGB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the display's fonts into glyph atlas caches.")
+    parser.parse_args()
+
+    for filename, characters in DISPLAY_FONTS.items():
+        atlas = render(filename, bdf.load(filename, {ord(c) for c in characters} | {REPLACEMENT_CHARACTER}),
+                       characters)
+        write_cache(atlas, characters)
+        print(f'{filename}: {len(atlas._glyphs)} glyphs -> {cache_file(filename)} '
+              f'({os.path.getsize(cache_file(filename))} bytes)')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+# LED matrix temperature / UV display
+# Observation history.  Every reading is kept in one binary file of fixed size records
+# (time, temperature, UV, light and brightness) that is only ever appended to, and read back by
+# memory mapping it.  A per-day low / high index is built from it at startup and kept up to date
+# as readings arrive, so today's high and low - also after a restart - are a dictionary lookup.
+#
+# To spare the SD card, at most one record a minute is kept (and every new high or low for the day),
+# and records are written in batches every 10 minutes.  A batch holding a new high or low is written
+# after 3 minutes instead.  Records older than the retention period are dropped by compacting the
+# file, at startup and once a day after that, once enough of it has expired to be worth rewriting.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import time
+import logging
+
+import numpy as np
+
+# Start of the file.  The rest of the 16 byte header is the record size, as a check.
+MAGIC = b'LEDHIST1'
+HEADER_SIZE = 16
+
+# Temperatures are Fahrenheit, as Davis sends them.  NaN where there was no reading.
+RECORD = np.dtype([('ts', '<u4'),  # Unix time of the observation
+                   ('temp', '<f4'),
+                   ('uv', '<f4'),
+                   ('lux', '<f4'),  # light sensor, if there is one
+                   ('brightness', '<f4')])  # matrix brightness percent
+
+# Least time between two records written, unless the second is a new high or low for the day
+RECORD_SECONDS = 60
+
+# Longest time a record is held in memory before being written
+FLUSH_SECONDS = 10 * 60
+
+# The same for a new high or low for the day.  Still a batch: on a warming morning nearly every
+# reading is a new high.
+EXTREME_FLUSH_SECONDS = 3 * 60
+
+RETENTION_DAYS = 366
+
+# Compact once this share of the file has expired
+COMPACT_FRACTION = 0.1
+
+
+def local_days(ts):
+    # Local calendar day number (days since 1970-01-01) of each Unix time in ts.  The UTC offset is
+    # looked up once per hour covered rather than once per record.
+    ts = np.asarray(ts, dtype=np.int64)
+    hours, inverse = np.unique(ts // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours], dtype=np.int64)
+    return (ts + offsets[inverse.reshape(ts.shape)]) // 86400
+
+
+def local_day(ts):
+    return (int(ts) + time.localtime(ts).tm_gmtoff) // 86400
+
+
+class HistoryStore:
+    def __init__(self, filename, retention_days=RETENTION_DAYS):
+        self.filename = filename
+        self.retention = retention_days * 86400
+
+        self._pending = []  # records not yet written, oldest first
+        self._last_ts = None  # latest reading, written or not
+        self._last_written = None  # time of the latest record, written or pending
+        self._flush_at = None  # monotonic time the pending records must be written by
+        self._map = None  # memory map of the records in the file
+        self._mapped_size = None  # file size when it was mapped
+
+        # local day number -> [low, high] temperature that day
+        self.days = {}
+
+        # statistics
+        self.appended = 0
+        self.written = 0
+        self.writes = 0
+        self.compactions = 0
+
+        self._open()
+
+    def _open(self):
+        # Creates the file, or checks it and drops a record left half written by a crash
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            size = 0
+
+        if size < HEADER_SIZE:
+            self._create([])
+            return
+
+        with open(self.filename, 'rb') as file:
+            header = file.read(HEADER_SIZE)
+        if header[:len(MAGIC)] != MAGIC or int.from_bytes(header[8:12], 'little') != RECORD.itemsize:
+            logging.warning('History file %s is not readable.  Starting a new one.', self.filename)
+            self._create([])
+            return
+
+        whole = HEADER_SIZE + (size - HEADER_SIZE) // RECORD.itemsize * RECORD.itemsize
+        if whole != size:
+            os.truncate(self.filename, whole)
+
+        records = self.records()
+        if len(records):
+            self._last_ts = self._last_written = int(records['ts'][-1])
+        self._index(records)
+
+    def _create(self, records):
+        # Writes a new file holding records.  Written under a temporary name and renamed so a crash
+        # part way through leaves the old file as it was.
+        with open(self.filename + '.tmp', 'wb') as file:
+            file.write(MAGIC + RECORD.itemsize.to_bytes(4, 'little') + bytes(HEADER_SIZE - len(MAGIC) - 4))
+            file.write(np.ascontiguousarray(records, dtype=RECORD).tobytes())
+        os.replace(self.filename + '.tmp', self.filename)
+        self._map = None
+        self._mapped_size = None
+        self.writes += 1
+
+    def _index(self, records):
+        # Daily low and high of records, which must be in time order
+        self.days = {}
+        valid = records[~np.isnan(records['temp'])]
+        if not len(valid):
+            return
+
+        days = local_days(valid['ts'])
+        starts = np.flatnonzero(np.diff(days, prepend=days[0] - 1))
+        lows = np.minimum.reduceat(valid['temp'], starts)
+        highs = np.maximum.reduceat(valid['temp'], starts)
+        for day, low, high in zip(days[starts].tolist(), lows.tolist(), highs.tolist()):
+            self.days[day] = [low, high]
+
+    def records(self, start=None, end=None):
+        # The records from start up to (not including) end, both Unix times, pending ones included.
+        # Those from the file are a read-only view of the memory map.
+        size = os.path.getsize(self.filename) - HEADER_SIZE
+        if size != self._mapped_size:
+            self._map = (np.memmap(self.filename, dtype=RECORD, mode='r', offset=HEADER_SIZE)
+                         if size else np.zeros(0, dtype=RECORD))
+            self._mapped_size = size
+
+        records = self._map
+        if self._pending:
+            records = np.concatenate((records, np.array(self._pending, dtype=RECORD)))
+
+        ts = records['ts']
+        first = np.searchsorted(ts, start) if start is not None else 0
+        last = np.searchsorted(ts, end) if end is not None else len(records)
+        return records[first:last]
+
+    def append(self, ts, temp, uv, lux, brightness):
+        # Adds a reading.  Returns True if it is a new high or low for its day.
+        ts = int(ts)
+        if self._last_ts is not None and ts <= self._last_ts:
+            return False  # the same observation again, or one older than the latest
+        self._last_ts = ts
+        self.appended += 1
+
+        extreme = False
+        if temp is not None:
+            day = self.days.get(local_day(ts))
+            if day is None:
+                self.days[local_day(ts)] = [temp, temp]
+                extreme = True
+            elif temp < day[0] or temp > day[1]:
+                day[0] = min(day[0], temp)
+                day[1] = max(day[1], temp)
+                extreme = True
+
+        if not extreme and self._last_written is not None and ts - self._last_written < RECORD_SECONDS:
+            return False
+
+        nan = float('nan')
+        self._pending.append((ts, nan if temp is None else temp, nan if uv is None else uv,
+                              nan if lux is None else lux, nan if brightness is None else brightness))
+        self._last_written = ts
+        now = time.monotonic()
+        flush_at = now + (EXTREME_FLUSH_SECONDS if extreme else FLUSH_SECONDS)
+        if self._flush_at is None or flush_at < self._flush_at:
+            self._flush_at = flush_at
+
+        if now >= self._flush_at:
+            self.flush()
+        return extreme
+
+    def flush(self):
+        if not self._pending:
+            return
+        try:
+            with open(self.filename, 'ab') as file:
+                file.write(np.array(self._pending, dtype=RECORD).tobytes())
+        except OSError as err:
+            logging.error('Could not write history file %s: %s', self.filename, err)
+            return  # kept for the next try
+
+        self.written += len(self._pending)
+        self.writes += 1
+        self._pending = []
+        self._flush_at = None
+
+    def merge_day(self, ts, low, high):
+        # Widens the low / high of the local day of ts to take in low and high, for readings that are
+        # not in the file (such as those kept by older versions of the display)
+        day = self.days.setdefault(local_day(ts), [low, high])
+        day[0] = min(day[0], low)
+        day[1] = max(day[1], high)
+
+    def day_range(self, ts):
+        # (low, high) temperature on the local day of ts, or None if there were no readings.  Davis
+        # gives temperatures to a tenth of a degree, which float32 records hold only approximately.
+        day = self.days.get(local_day(ts))
+        return (round(day[0], 1), round(day[1], 1)) if day is not None else None
+
+    def compact(self, now=None):
+        # Drops records older than the retention period, if enough have expired to be worth
+        # rewriting the file.  Returns the number dropped.
+        self.flush()
+        cutoff = (now if now is not None else time.time()) - self.retention
+        records = self.records()
+        expired = int(np.searchsorted(records['ts'], cutoff))
+        if not expired or expired < len(records) * COMPACT_FRACTION:
+            return 0
+
+        kept = np.array(records[expired:])  # a copy, as the file under the map is about to be replaced
+        self._create(kept)
+        # Only days that have gone entirely are dropped from the index.  Rebuilding it from what is
+        # kept would lose the part of the oldest day before the cutoff, and anything merge_day() added.
+        cutoff_day = local_day(cutoff)
+        self.days = {day: low_high for day, low_high in self.days.items() if day >= cutoff_day}
+        self.compactions += 1
+        logging.info('History compacted.  Dropped %d records older than %d days, kept %d.',
+                     expired, self.retention // 86400, len(kept))
+        return expired
+
+    def close(self):
+        self.flush()
+        self._map = None
+        self._mapped_size = None
+
+    def stats(self):
+        return {'appended': self.appended,
+                'written': self.written,
+                'writes': self.writes,
+                'pending': len(self._pending),
+                'compactions': self.compactions,
+                'days': len(self.days),
+                'file_bytes': os.path.getsize(self.filename)}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('History readings:%d records written:%d in %d writes, pending:%d days:%d file:%d bytes',
+                     s['appended'], s['written'], s['writes'], s['pending'], s['days'], s['file_bytes'])
@@ -0,0 +1,125 @@
+# LED matrix temperature / UV display
+# Shared HTTP client.  One pooled keep-alive session with timeouts and per-endpoint latency stats.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import time
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Histogram, LATENCY_BUCKETS
+
+# Number of recent samples kept per endpoint for the latency percentiles
+LATENCY_SAMPLES = 256
+
+
+class LatencyStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+        self.histogram = Histogram(LATENCY_BUCKETS)  # every request, for the metrics endpoint
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+        self.histogram.observe(seconds)
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def as_dict(self):
+        return {'count': self.count,
+                'errors': self.errors,
+                'mean': self.total / self.count if self.count else 0.0,
+                'p50': self.percentile(50),
+                'p95': self.percentile(95),
+                'max': self.max}
+
+
+class HttpClient:
+    def __init__(self, connect_timeout, read_timeout, pool_size=2):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        # Keep-alive connections are reused between calls so we only pay the TCP + TLS handshake
+        # when the server (or Wi-Fi) drops the connection.  No automatic retries - the main loop
+        # already retries every minute and we would rather report the error.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}  # endpoint name -> LatencyStats
+
+    def get(self, url, name, headers=None, time_left=None):
+        # name groups the stats, e.g. "v2_stations".  time_left (seconds) caps the read timeout so a
+        # stalled socket cannot run past the caller's own time budget.
+        return self._request('GET', url, name, headers, time_left)
+
+    def post(self, url, name, json=None, headers=None, time_left=None):
+        # Same as get(), with json sent as the request body
+        return self._request('POST', url, name, headers, time_left, json=json)
+
+    def _request(self, method, url, name, headers, time_left, **kwargs):
+        read_timeout = self.read_timeout
+        if time_left is not None:
+            read_timeout = max(1.0, min(read_timeout, time_left))
+
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, headers=headers,
+                                            timeout=(self.connect_timeout, read_timeout), verify=True, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._stats.setdefault(name, LatencyStats()).errors += 1
+            raise
+
+        with self._lock:
+            self._stats.setdefault(name, LatencyStats()).add(time.monotonic() - start)
+
+        return response
+
+    def connection_counts(self):
+        # How many TCP connections the pools have opened versus requests sent over them.
+        # With keep-alive working, connections should stay far below requests.
+        opened = requests_sent = 0
+        for adapter in set(self.session.adapters.values()):
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    requests_sent += pool.num_requests
+        return opened, requests_sent
+
+    def stats(self):
+        with self._lock:
+            return {name: s.as_dict() for name, s in self._stats.items()}
+
+    def histograms(self):
+        # endpoint name -> (latency Histogram, errors)
+        with self._lock:
+            return {name: (s.histogram, s.errors) for name, s in self._stats.items()}
+
+    def log_stats(self):
+        for name, s in self.stats().items():
+            logging.info('HTTP %-12s requests:%d errors:%d latency mean/p50/p95/max:%.3f/%.3f/%.3f/%.3fs',
+                         name, s['count'], s['errors'], s['mean'], s['p50'], s['p95'], s['max'])
+        opened, requests_sent = self.connection_counts()
+        logging.info('HTTP connections opened:%d for %d requests', opened, requests_sent)
+
+    def close(self):
+        self.session.close()
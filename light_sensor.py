@@ -0,0 +1,95 @@
+# LED matrix temperature / UV display
+# VEML7700 ambient light sensor.  One long-lived sensor handle sampled on its own cadence into a
+# small ring buffer.  Readings are median filtered (throws out a passing car's headlights) and then
+# smoothed with an exponential moving average (passing clouds).  If the sensor stops answering it
+# is re-opened with a backoff rather than being given up on for good.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import time
+import logging
+from array import array
+
+# Number of recent samples the median is taken over
+SAMPLES = 15
+
+# Weight of each new median in the moving average.  Lower is smoother but slower to follow.
+EMA_ALPHA = 0.2
+
+# A reading older than this is no good for setting the brightness
+STALE_SECONDS = 60
+
+# Wait between attempts to (re)open the sensor, doubling after each failure
+RETRY_MIN_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+
+
+class LightSensor:
+    def __init__(self):
+        self._sensor = None
+        self._samples = array('d', [0.0] * SAMPLES)  # ring buffer of raw lux readings
+        self._count = 0  # total samples taken.  Next slot is _count % SAMPLES.
+        self._ema = None
+        self._last_good = None  # monotonic time of the last good reading
+        self._retry_delay = RETRY_MIN_SECONDS
+        self._retry_at = 0.0
+
+        # statistics
+        self.failures = 0
+        self.reopens = 0
+
+    def _open(self):
+        # Imported here so the display still starts on systems without the sensor libraries
+        import board
+        import adafruit_veml7700
+
+        self._sensor = adafruit_veml7700.VEML7700(board.I2C())
+        self.reopens += 1
+
+    def _failed(self, what, err):
+        self.failures += 1
+        self._sensor = None
+        self._retry_at = time.monotonic() + self._retry_delay
+        logging.warning('Light sensor %s failed: %s.  Retrying in %d seconds.', what, err, self._retry_delay)
+        self._retry_delay = min(self._retry_delay * 2, RETRY_MAX_SECONDS)
+
+    def sample(self):
+        # The scheduler runs this every couple of seconds.
+        if self._sensor is None:
+            if time.monotonic() < self._retry_at:
+                return
+            try:
+                self._open()
+            except Exception as err:
+                self._failed('open', err)
+                return
+
+        try:
+            lux = float(self._sensor.light)
+        except Exception as err:
+            self._failed('read', err)
+            return
+
+        self._retry_delay = RETRY_MIN_SECONDS
+        self._last_good = time.monotonic()
+
+        self._samples[self._count % SAMPLES] = lux
+        self._count += 1
+
+        filled = sorted(self._samples[:min(self._count, SAMPLES)])
+        median = filled[len(filled) // 2]
+
+        if self._ema is None:
+            self._ema = median
+        else:
+            self._ema += EMA_ALPHA * (median - self._ema)
+
+    @property
+    def available(self):
+        return self._last_good is not None and time.monotonic() - self._last_good < STALE_SECONDS
+
+    @property
+    def light(self):
+        # Smoothed lux, or None if there is no recent reading
+        return self._ema if self.available else None
@@ -0,0 +1,14 @@
+# LED matrix temperature / UV display
+# In-memory stand-in for the rpi-rgb-led-matrix Python bindings.  Lets the display code run, be
+# profiled and be checked on any Linux box.  Mirrors the rgbmatrix package layout so it can be
+# imported the same way:
+#
+#   from matrix_emulator import RGBMatrix, RGBMatrixOptions, graphics
+#
+# The framebuffer of each canvas is a (height, width, 3) uint8 NumPy array.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+from matrix_emulator.core import RGBMatrix, RGBMatrixOptions, FrameCanvas
+from matrix_emulator import graphics
@@ -0,0 +1,139 @@
+# LED matrix temperature / UV display
+# Emulated matrix and frame canvases.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import numpy as np
+
+
+class RGBMatrixOptions:
+    # Same defaults as the library.  Anything else set on it (hardware mapping, GPIO timing...) is accepted and ignored.
+    def __init__(self):
+        self.rows = 32
+        self.cols = 32
+        self.chain_length = 1
+        self.parallel = 1
+        self.brightness = 100
+
+
+class FrameCanvas:
+    def __init__(self, width, height, brightness=100):
+        self._width = width
+        self._height = height
+        self.brightness = brightness
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    def _scale(self, r, g, b):
+        # Like the library, brightness is applied as pixels are drawn, not when they are shown
+        if self.brightness >= 100:
+            return r, g, b
+        return r * self.brightness // 100, g * self.brightness // 100, b * self.brightness // 100
+
+    def SetPixel(self, x, y, r, g, b):
+        x = int(x)
+        y = int(y)
+        if 0 <= x < self._width and 0 <= y < self._height:
+            self.frame[y, x] = self._scale(r, g, b)
+
+    def _fill_row(self, y, x1, x2, r, g, b):
+        # Pixels x1..x2 (inclusive, either order) of row y.  Used by DrawLine for horizontal lines.
+        if 0 <= y < self._height:
+            x1, x2 = max(0, min(x1, x2)), min(self._width - 1, max(x1, x2))
+            if x1 <= x2:
+                self.frame[y, x1:x2 + 1] = self._scale(r, g, b)
+
+    def Clear(self):
+        self.frame[:] = 0
+
+    def Fill(self, r, g, b):
+        self.frame[:] = self._scale(r, g, b)
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        # Accepts a PIL image (like the library) or an (h, w, 3) array
+        if not isinstance(image, np.ndarray):
+            image = np.asarray(image.convert('RGB'))
+
+        h, w = image.shape[:2]
+        x0, y0 = max(0, offset_x), max(0, offset_y)
+        x1, y1 = min(self._width, offset_x + w), min(self._height, offset_y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        pixels = image[y0 - offset_y:y1 - offset_y, x0 - offset_x:x1 - offset_x, :3]
+        if self.brightness < 100:
+            pixels = (pixels.astype(np.uint16) * self.brightness // 100).astype(np.uint8)
+        self.frame[y0:y1, x0:x1] = pixels
+
+
+class RGBMatrix:
+    def __init__(self, options=None):
+        options = options or RGBMatrixOptions()
+        self._width = options.cols * options.chain_length
+        self._height = options.rows * options.parallel
+        self._brightness = options.brightness
+        self._active = FrameCanvas(self._width, self._height, self._brightness)
+
+        # statistics
+        self.swaps = 0
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def brightness(self):
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        # The library changes the brightness of the canvas currently being shown
+        self._brightness = value
+        self._active.brightness = value
+
+    @property
+    def frame(self):
+        # What the panel is showing right now
+        return self._active.frame
+
+    def CreateFrameCanvas(self):
+        return FrameCanvas(self._width, self._height, self._brightness)
+
+    def SwapOnVSync(self, canvas, framerate_fraction=1):
+        # Shows canvas and hands back the one that was showing, like the library
+        previous, self._active = self._active, canvas
+        self.swaps += 1
+        return previous
+
+    def SetPixel(self, x, y, r, g, b):
+        self._active.SetPixel(x, y, r, g, b)
+
+    def _fill_row(self, y, x1, x2, r, g, b):
+        self._active._fill_row(y, x1, x2, r, g, b)
+
+    def Clear(self):
+        self._active.Clear()
+
+    def Fill(self, r, g, b):
+        self._active.Fill(r, g, b)
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        self._active.SetImage(image, offset_x, offset_y, unsafe)
+
+    def to_ppm(self, filename):
+        # Save what the panel is showing as a plain PPM image for a quick look
+        with open(filename, "wb") as file:
+            file.write(b"P6 %d %d 255\n" % (self._width, self._height))
+            file.write(self.frame.tobytes())
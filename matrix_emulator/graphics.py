@@ -0,0 +1,111 @@
+# LED matrix temperature / UV display
+# Emulated rgbmatrix.graphics - colours, BDF fonts and the drawing helpers.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import bdf
+
+# The library draws this glyph in place of any character the font does not have
+REPLACEMENT_CHARACTER = 0xFFFD
+
+# Parsed fonts, shared by every Font that loads the same file
+_loaded = {}
+
+
+class Color:
+    def __init__(self, red=0, green=0, blue=0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+
+class Font:
+    def __init__(self):
+        self._font = bdf.BDFFont()
+
+    def LoadFont(self, file):
+        font = _loaded.get(file)
+        if font is None:
+            font = _loaded[file] = bdf.load(file)
+        self._font = font
+
+    @property
+    def height(self):
+        return self._font.height
+
+    @property
+    def baseline(self):
+        return self._font.baseline
+
+    def _find(self, codepoint):
+        glyph = self._font.glyph(codepoint)
+        if glyph is None:
+            glyph = self._font.glyph(REPLACEMENT_CHARACTER)
+        return glyph
+
+    def CharacterWidth(self, char):
+        glyph = self._font.glyph(char)
+        return glyph.device_width if glyph is not None else -1
+
+    def DrawGlyph(self, c, x, y, color, char):
+        # y is the baseline.  Returns how far to advance.
+        glyph = self._find(char)
+        if glyph is None:
+            return 0
+
+        top = y - glyph.height - glyph.y_offset
+        left = x + glyph.x_offset
+        for px, py in glyph.pixels():
+            c.SetPixel(left + px, top + py, color.red, color.green, color.blue)
+        return glyph.device_width
+
+
+def DrawText(c, f, x, y, color, text):
+    # Draws text with its baseline at y.  Returns the width drawn in pixels.
+    x = int(x)
+    y = int(y)
+    start = x
+    for char in text:
+        x += f.DrawGlyph(c, x, y, color, ord(char))
+    return x - start
+
+
+def DrawLine(c, x1, y1, x2, y2, color):
+    # Bresenham, end points included
+    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+    if y1 == y2:
+        # Horizontal lines (e.g. blanking part of the display) are filled in one go
+        c._fill_row(y1, x1, x2, color.red, color.green, color.blue)
+        return
+    dx = abs(x2 - x1)
+    dy = -abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx + dy
+    while True:
+        c.SetPixel(x1, y1, color.red, color.green, color.blue)
+        if x1 == x2 and y1 == y2:
+            break
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x1 += sx
+        if e2 <= dx:
+            err += dx
+            y1 += sy
+
+
+def DrawCircle(c, x, y, r, color):
+    # Midpoint circle
+    x, y, r = int(x), int(y), int(r)
+    px, py, err = r, 0, 1 - r
+    while px >= py:
+        for ox, oy in ((px, py), (py, px), (-py, px), (-px, py), (-px, -py), (-py, -px), (py, -px), (px, -py)):
+            c.SetPixel(x + ox, y + oy, color.red, color.green, color.blue)
+        py += 1
+        if err < 0:
+            err += 2 * py + 1
+        else:
+            px -= 1
+            err += 2 * (py - px) + 1
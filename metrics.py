@@ -0,0 +1,191 @@
+# LED matrix temperature / UV display
+# Metrics endpoint.  Serves the display's runtime statistics (errors, fetch latency, brightness,
+# light, CPU temperature, memory, uptime, scheduler drift and frame render time) over HTTP in the
+# Prometheus text format, so they can be scraped by Prometheus or simply viewed in a browser:
+#
+#   http://<pi address>:<port>/metrics
+#
+# Nothing is formatted until a scrape arrives.  The display only bumps plain counters as it goes,
+# each written by a single thread, so there is no lock on the drawing or fetching path.  A scrape
+# reads them from the server's own thread and may see one update more or less than the next.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import math
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Metric names all start with this
+PREFIX = 'led_display_'
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RENDER_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+
+
+class Histogram:
+    # Counts of observed values per bucket.  observe() is for one thread only.
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last is above every bucket
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for key, value in labels.items()) + '}'
+
+
+class Exposition:
+    # One scrape's worth of metrics in the Prometheus text format
+    def __init__(self):
+        self.lines = []
+
+    def _header(self, name, kind, help_text):
+        self.lines.append(f'# HELP {PREFIX}{name} {help_text}')
+        self.lines.append(f'# TYPE {PREFIX}{name} {kind}')
+
+    def gauge(self, name, help_text, value, labels=None):
+        # A single value.  Skipped entirely if it is None (e.g. no light sensor).
+        if value is not None:
+            self.gauges(name, help_text, [(labels, value)])
+
+    def gauges(self, name, help_text, samples):
+        # samples is a list of (labels, value)
+        self._header(name, 'gauge', help_text)
+        for labels, value in samples:
+            self.lines.append(f'{PREFIX}{name}{_labels(labels)} {_number(value)}')
+
+    def counter(self, name, help_text, value, labels=None):
+        self.counters(name, help_text, [(labels, value)])
+
+    def counters(self, name, help_text, samples):
+        self._header(name, 'counter', help_text)
+        for labels, value in samples:
+            self.lines.append(f'{PREFIX}{name}_total{_labels(labels)} {_number(value)}')
+
+    def histograms(self, name, help_text, samples):
+        # samples is a list of (labels, Histogram).  Buckets are cumulative as Prometheus expects.
+        self._header(name, 'histogram', help_text)
+        for labels, histogram in samples:
+            counts = list(histogram.counts)  # one copy so the buckets and count agree
+            labels = labels or {}
+            total = 0
+            for bound, count in zip(histogram.buckets + (float('inf'),), counts):
+                total += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                self.lines.append(f'{PREFIX}{name}_bucket{_labels({**labels, "le": le})} {total}')
+            self.lines.append(f'{PREFIX}{name}_sum{_labels(labels)} {_number(histogram.sum)}')
+            self.lines.append(f'{PREFIX}{name}_count{_labels(labels)} {total}')
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+class MetricsServer:
+    # Answers GET /metrics from a background thread.  collect(exposition) is called on that thread
+    # for every scrape to fill in the metrics.
+    def __init__(self, address, port, collect):
+        self.address = address
+        self.port = port
+        self.collect = collect
+        self._server = None
+        self._thread = None
+
+        # statistics
+        self.scrapes = 0
+        self.failures = 0
+        self.scrape_seconds = 0.0
+
+    def start(self):
+        # Returns False, having logged why, if the port could not be opened
+        try:
+            self._server = ThreadingHTTPServer((self.address, self.port), self._handler())
+        except OSError as err:
+            logging.error('Could not start the metrics endpoint on port %d: %s', self.port, err)
+            return False
+
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]  # the one picked if port was 0
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        logging.info('Metrics endpoint at http://%s:%d/metrics', self.address or '0.0.0.0', self.port)
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def scrape(self):
+        # The metrics as text
+        start = time.perf_counter()
+        exposition = Exposition()
+        self.collect(exposition)
+        exposition.counter('metrics_scrapes', 'Scrapes answered before this one.', self.scrapes)
+        text = exposition.text()
+        self.scrapes += 1
+        self.scrape_seconds += time.perf_counter() - start
+        return text
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+
+                try:
+                    body = server.scrape().encode()
+                except Exception as err:
+                    # Never let a bad value take the endpoint down.  Log it and answer 500.
+                    server.failures += 1
+                    logging.exception('Metrics scrape failed: %s', err)
+                    self.send_error(500)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would flood the log file
+                logging.debug('Metrics %s ' + format, self.client_address[0], *args)
+
+        return Handler
+
+    def stats(self):
+        return {'scrapes': self.scrapes,
+                'failures': self.failures,
+                'mean_scrape_seconds': self.scrape_seconds / self.scrapes if self.scrapes else 0.0}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('Metrics scrapes:%d failed:%d mean time:%.4fs', s['scrapes'], s['failures'],
+                     s['mean_scrape_seconds'])
@@ -0,0 +1,242 @@
+# LED matrix temperature / UV display
+# Connectivity watchdog.  The fetch code only reports whether it could reach the Davis server.
+# A background thread decides what to do about a run of failures, escalating one step at a time
+# with a minimum wait between attempts at each step:
+#
+#   1. retry - the poller already does this, with its own backoff
+#   2. probe - can we resolve the server's name and open a socket to it?  Is the Wi-Fi link up?
+#   3. bounce the Wi-Fi interface (down, wait, up) if the probe fails
+#   4. reboot the Pi - only if turned on in config.json, and never soon after starting
+#
+# Nothing here ever runs on the main thread so the display keeps updating throughout.  How long
+# each outage lasted, and the last step taken before it cleared, are recorded.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import time
+import socket
+import logging
+import threading
+import subprocess
+from collections import deque
+
+# Failures in a row before each step, and the least time between two attempts at it
+PROBE_AFTER_FAILURES = 2
+PROBE_INTERVAL_SECONDS = 60
+BOUNCE_AFTER_FAILURES = 6
+BOUNCE_INTERVAL_SECONDS = 10 * 60
+
+# A reboot also needs at least this many bounces to have failed first, and the program to have
+# been running this long, so a network that is down for good cannot cause a reboot loop.
+REBOOT_AFTER_BOUNCES = 2
+REBOOT_MIN_UPTIME_SECONDS = 60 * 60
+
+PROBE_TIMEOUT_SECONDS = 5
+
+# Number of recent outages kept for the statistics
+OUTAGES_KEPT = 32
+
+# Steps, in escalating order
+RETRY = 'retry'
+PROBE = 'probe'
+BOUNCE = 'bounce'
+REBOOT = 'reboot'
+
+
+class NetworkWatchdog:
+    def __init__(self, host, port=443, interface="wlan0", reboot_after_minutes=0):
+        self.host = host
+        self.port = port
+        self.interface = interface
+        self.reboot_after = reboot_after_minutes * 60  # 0 never reboots
+
+        self._lock = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._started = time.monotonic()
+
+        # Current outage
+        self._failures = 0  # in a row
+        self._outage_start = None  # monotonic time of the first failure
+        self._step = RETRY  # furthest step taken so far
+        self._bounces_this_outage = 0
+        self._reboot_tried = False
+        self._probe_failed = False  # result of the latest probe
+        self._last_probe = None
+        self._last_bounce = None
+        self.link_state = None  # from /sys/class/net, e.g. "up", "down" or "dormant"
+
+        # statistics
+        self.probes = 0
+        self.probe_failures = 0
+        self.bounces = 0
+        self.outages = deque(maxlen=OUTAGES_KEPT)  # (seconds, last step taken)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='network-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join(PROBE_TIMEOUT_SECONDS * 2)
+
+    def report_success(self):
+        # Called by the fetch code whenever the server answered.  Cheap, never blocks.
+        with self._lock:
+            if self._outage_start is not None:
+                seconds = time.monotonic() - self._outage_start
+                self.outages.append((seconds, self._step))
+                logging.info('Network recovered after %.0f seconds and %d failures.  Last step taken: %s.',
+                             seconds, self._failures, self._step)
+            self._failures = 0
+            self._outage_start = None
+            self._step = RETRY
+            self._bounces_this_outage = 0
+            self._reboot_tried = False
+            self._probe_failed = False
+
+    def report_failure(self):
+        # Called by the fetch code when the server could not be reached.  Cheap, never blocks.
+        with self._lock:
+            self._failures += 1
+            if self._outage_start is None:
+                self._outage_start = time.monotonic()
+            self._lock.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopping and not self._due():
+                    # Check again later even without a new failure, so a step that was rate limited
+                    # still happens once its wait is over.
+                    self._lock.wait(PROBE_INTERVAL_SECONDS if self._failures else None)
+                if self._stopping:
+                    return
+                action = self._due()
+
+            # The slow work happens without the lock held so reporting never waits on it
+            if action == PROBE:
+                self._probe()
+            elif action == BOUNCE:
+                self._bounce()
+            elif action == REBOOT:
+                self._reboot()
+
+    def _due(self):
+        # The step to take now, if any.  Called with the lock held.
+        if self._failures < PROBE_AFTER_FAILURES:
+            return None
+
+        now = time.monotonic()
+
+        if (self.reboot_after and not self._reboot_tried and self._bounces_this_outage >= REBOOT_AFTER_BOUNCES
+                and now - self._outage_start >= self.reboot_after
+                and now - self._started >= REBOOT_MIN_UPTIME_SECONDS):
+            return REBOOT
+
+        # Only bounce the interface once a probe has shown the problem is at our end
+        if self._failures >= BOUNCE_AFTER_FAILURES and self._probe_failed:
+            if self._last_bounce is None or now - self._last_bounce >= BOUNCE_INTERVAL_SECONDS:
+                return BOUNCE
+
+        if self._last_probe is None or now - self._last_probe >= PROBE_INTERVAL_SECONDS:
+            return PROBE
+        return None
+
+    def _read_link_state(self):
+        try:
+            with open(f'/sys/class/net/{self.interface}/operstate') as file:
+                state = file.read().strip()
+        except OSError:
+            state = None
+
+        if state != self.link_state:
+            logging.info('Network interface %s is %s', self.interface, state or 'missing')
+            self.link_state = state
+
+    def _probe(self):
+        # Name lookup then a TCP connection to the server.  Either failing points at our end.
+        self._read_link_state()
+        error = None
+        try:
+            address = socket.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)[0][4]
+            try:
+                with socket.create_connection(address[:2], timeout=PROBE_TIMEOUT_SECONDS):
+                    pass
+            except OSError as err:
+                error = f'cannot connect to {self.host}:{self.port}: {err}'
+        except OSError as err:
+            error = f'cannot resolve {self.host}: {err}'
+
+        with self._lock:
+            self.probes += 1
+            self._last_probe = time.monotonic()
+            self._probe_failed = error is not None
+            if error:
+                self.probe_failures += 1
+            if self._step == RETRY:
+                self._step = PROBE
+
+        if error:
+            logging.warning('Network probe failed: %s', error)
+        else:
+            logging.info('Network probe reached %s:%d.  The problem is likely at the server.', self.host, self.port)
+
+    def _bounce(self):
+        # In case dead wifi due to Pi, will try restarting it...
+        logging.warning('Restarting network interface %s', self.interface)
+        with self._lock:
+            self._last_bounce = time.monotonic()
+            self._bounces_this_outage += 1
+            if self._step != REBOOT:
+                self._step = BOUNCE
+            self.bounces += 1
+            # Probe again after the bounce before deciding on anything more
+            self._last_probe = None
+            self._probe_failed = False
+
+        for state in ('down', 'up'):
+            try:
+                subprocess.run(['sudo', 'ip', 'link', 'set', self.interface, state], timeout=30, check=False)
+            except (OSError, subprocess.TimeoutExpired) as err:
+                logging.error('Could not set %s %s: %s', self.interface, state, err)
+            if state == 'down':
+                time.sleep(2)
+
+        self._read_link_state()
+
+    def _reboot(self):
+        with self._lock:
+            self._step = REBOOT
+            self._reboot_tried = True
+            minutes = (time.monotonic() - self._outage_start) / 60
+        logging.critical('No network for %.0f minutes after %d interface restarts.  Rebooting.',
+                         minutes, self._bounces_this_outage)
+        try:
+            subprocess.run(['sudo', 'reboot'], timeout=30, check=False)
+        except (OSError, subprocess.TimeoutExpired) as err:
+            logging.error('Could not reboot: %s', err)
+
+        # If we are still here the reboot did not happen.  It is not tried again this outage.
+
+    def stats(self):
+        with self._lock:
+            times = [seconds for seconds, _ in self.outages]
+            return {'failures': self._failures,
+                    'link_state': self.link_state,
+                    'probes': self.probes,
+                    'probe_failures': self.probe_failures,
+                    'bounces': self.bounces,
+                    'outages': len(times),
+                    'recovery_mean': sum(times) / len(times) if times else 0.0,
+                    'recovery_max': max(times) if times else 0.0}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('Network outages:%d recovery mean/max:%.0f/%.0fs probes:%d failed:%d interface restarts:%d',
+                     s['outages'], s['recovery_mean'], s['recovery_max'], s['probes'], s['probe_failures'],
+                     s['bounces'])
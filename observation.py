@@ -0,0 +1,129 @@
+# LED matrix temperature / UV display
+# Davis WeatherLink payload parsing.  The V1 NoaaExt.json and V2 current conditions responses, and
+# those of a WeatherLink Live on the local network, are each turned into one small Observation record so get_temp() no longer needs to know where in
+# either payload a value lives.  Temperatures stay in Fahrenheit, as Davis sends them, until they
+# are shown.
+#
+# orjson is used to decode the payloads if it is installed (pip install orjson).  It is optional and
+# the standard json module is used without it.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import time
+
+try:
+    from orjson import loads  # its JSONDecodeError is a json.JSONDecodeError so callers catch either
+    JSON_DECODER = 'orjson'
+except ImportError:
+    from json import loads
+    JSON_DECODER = 'json'
+
+# A WeatherLink Live's own API numbers its sensors differently to the cloud API.  1 is an ISS,
+# the outdoor sensor suite.
+LOCAL_ISS = 1
+
+# V2 sensors the display reads, by data_structure_type: keys for temperature, UV and time.
+# When a station has more than one, the first in this order with a reading wins.
+V2_SENSORS = {23: ('temp', 'uv_index', 'ts'),  # Davis 6313 Console
+              2: ('temp_out', 'uv', 'ts')}  # WeatherLinkIP device
+
+
+class Observation:
+    # One reading from the station.  Any value can be None if its sensor is missing or has a flat battery.
+    __slots__ = ('temp', 'temp_high', 'temp_low', 'uv', 'observed_at')
+
+    def __init__(self, temp=None, temp_high=None, temp_low=None, uv=None, observed_at=None):
+        self.temp = temp  # Fahrenheit
+        self.temp_high = temp_high  # today's, only from the V1 API
+        self.temp_low = temp_low
+        self.uv = uv
+        self.observed_at = observed_at  # Unix time of the reading
+
+    def __repr__(self):
+        return (f'Observation(temp={self.temp}, temp_high={self.temp_high}, temp_low={self.temp_low}, '
+                f'uv={self.uv}, observed_at={self.observed_at})')
+
+
+def fahrenheit_to_celsius(temp):
+    if temp is None:
+        return None
+    return round((temp - 32) * 5 / 9, 1)
+
+
+def _number(value):
+    return float(value) if value is not None else None
+
+
+def parse_v1(results, now=None):
+    # NoaaExt.json.  A KeyError means the payload is not an observation at all.
+    current = results['davis_current_observation']
+    age = int(current['observation_age'])
+    return Observation(_number(results.get('temp_f')),
+                       _number(current.get('temp_day_high_f')),
+                       _number(current.get('temp_day_low_f')),
+                       _number(current.get('uv_index')),
+                       int(now if now is not None else time.time()) - age)
+
+
+def index_sensors(sensors, wanted=V2_SENSORS):
+    # data_structure_type -> latest record of each sensor of that type, in payload order.  Only the
+    # wanted types are kept.
+    index = {structure_type: [] for structure_type in wanted}
+    for sensor in sensors:
+        records = index.get(sensor.get('data_structure_type'))
+        if records is not None and sensor.get('data'):
+            records.append(sensor['data'][0])
+    return index
+
+
+def parse_v2(results):
+    # /v2/current.  A KeyError means there is no sensor list.  The observation time is that of the
+    # sensor the temperature came from, or the UV if there is no temperature.
+    index = index_sensors(results['sensors'])
+
+    temp = uv = timestamp = None
+    for structure_type, (temp_key, uv_key, ts_key) in V2_SENSORS.items():
+        for record in index[structure_type]:
+            if temp is None and record.get(temp_key) is not None:
+                temp = record[temp_key]
+                timestamp = _number(record.get(ts_key))
+            if uv is None and record.get(uv_key) is not None:
+                uv = record[uv_key]
+                if timestamp is None:
+                    timestamp = _number(record.get(ts_key))
+
+    return Observation(_number(temp), None, None, _number(uv),
+                       int(timestamp) if timestamp is not None else None)
+
+
+def find_station(results, station_name):
+    # /v2/stations.  The ID of the named station, or of the only station on the account whatever its
+    # name.  None if there is no such station.
+    stations = results['stations']
+    if len(stations) == 1:
+        return stations[0]['station_id']
+
+    for station in stations:
+        if station['station_name'] == station_name:
+            return station['station_id']
+    return None
+
+
+def parse_local(results):
+    # /v1/current_conditions from a WeatherLink Live.  A ValueError if the device answered with an
+    # error instead (it only serves so many requests at a time), a KeyError if there are no conditions.
+    if results.get('error'):
+        raise ValueError(f"WeatherLink Live error: {results['error']}")
+
+    current = results['data']
+    temp = uv = None
+    for condition in current['conditions']:
+        # The first ISS with a reading wins if there is more than one
+        if condition.get('data_structure_type') == LOCAL_ISS:
+            if temp is None:
+                temp = condition.get('temp')
+            if uv is None:
+                uv = condition.get('uv_index')
+
+    return Observation(_number(temp), None, None, _number(uv), int(current['ts']))
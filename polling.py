@@ -0,0 +1,103 @@
+# LED matrix temperature / UV display
+# Adaptive polling.  Decides when to next ask the Davis server for data based on when the
+# station last uploaded, rather than blindly fetching every minute.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import random
+import logging
+
+# Errors in a row before backing off.  Until then polls stay at the minimum interval, so the error
+# screen (shown after 6 errors in a row) and the network watchdog's bounce (after 6 failures) come
+# after about 6 minutes, not after the longer waits of the backoff.
+BACKOFF_AFTER_ERRORS = 6
+
+
+class AdaptivePoller:
+    def __init__(self, update_interval, min_interval=60, late_interval=60, max_backoff=300, settle=20, jitter=10,
+                 backoff_after=BACKOFF_AFTER_ERRORS):
+        # update_interval - how often the server is expected to have new data.  60 s for the legacy V1
+        #                   WeatherLinkIP, 900 s for the V2 free tier.  Lowered automatically if the
+        #                   station is seen updating faster (paid V2 plans update every 5 or 1 minutes).
+        # min_interval    - never poll more often than this.
+        # late_interval   - how often to poll once an update is overdue.
+        # max_backoff     - longest wait between polls after consecutive errors.
+        # backoff_after   - consecutive errors polled at min_interval before backing off.
+        # settle          - how long after the expected update time to ask, giving the server time to publish.
+        # jitter          - random 0..jitter seconds added so a fleet of displays does not poll in lockstep.
+        self.update_interval = update_interval
+        self.min_interval = min_interval
+        self.late_interval = late_interval
+        self.max_backoff = max_backoff
+        self.settle = settle
+        self.jitter = jitter
+        self.backoff_after = backoff_after
+
+        self.failures = 0  # consecutive polls without a usable observation
+        self.last_observed_at = None
+
+        # statistics
+        self.polls = 0
+        self.new_observations = 0
+        self.repeat_observations = 0
+        self.errors = 0
+        self.idle = 0
+
+    def next_delay(self, observed_at, now):
+        # observed_at - epoch seconds of the observation just fetched, or None if the fetch failed.
+        # now         - current epoch seconds.
+        # Returns the number of seconds to wait before polling again.
+        self.polls += 1
+
+        if observed_at is None:
+            self.errors += 1
+            self.failures += 1
+            # Every minute until the error is being shown, then exponential backoff, 120, 240 ... capped
+            if self.failures <= self.backoff_after:
+                delay = self.min_interval
+            else:
+                delay = min(self.min_interval * 2 ** (self.failures - self.backoff_after), self.max_backoff)
+            return delay + random.uniform(0, self.jitter)
+
+        self.failures = 0
+
+        if observed_at == self.last_observed_at:
+            self.repeat_observations += 1
+        else:
+            self.new_observations += 1
+            if self.last_observed_at is not None:
+                # Learn a faster update rate (e.g. a paid V2 subscription) from the gap between uploads
+                gap = observed_at - self.last_observed_at
+                if self.min_interval <= gap < self.update_interval:
+                    logging.info('Station appears to update every %d seconds.  Was expecting %d.',
+                                 gap, self.update_interval)
+                    self.update_interval = gap
+            self.last_observed_at = observed_at
+
+        expected = observed_at + self.update_interval + self.settle
+        if expected <= now:
+            # The next upload is overdue.  Check back more often until it shows up.
+            return self.late_interval + random.uniform(0, self.jitter)
+
+        delay = min(expected - now, self.update_interval + self.settle)
+        return max(delay, self.min_interval) + random.uniform(0, self.jitter)
+
+    def idle_delay(self):
+        # Nothing to fetch right now (e.g. after hours on V1).  Check again in a minute.
+        self.idle += 1
+        return self.min_interval
+
+    def stats(self):
+        return {'polls': self.polls,
+                'new_observations': self.new_observations,
+                'repeat_observations': self.repeat_observations,
+                'errors': self.errors,
+                'idle': self.idle,
+                'update_interval': self.update_interval}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('Polls:%d new:%d repeat:%d errors:%d idle:%d update interval:%ds',
+                     s['polls'], s['new_observations'], s['repeat_observations'], s['errors'], s['idle'],
+                     s['update_interval'])
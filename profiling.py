@@ -0,0 +1,197 @@
+# LED matrix temperature / UV display
+# Where the time goes.  Spans times each stage of the busy paths (fetching, parsing, the sun and
+# light sensor, laying out, drawing and swapping frames) into in-memory histograms, shown on the
+# metrics endpoint and logged at exit.  Profiler runs cProfile, or a sampler that records the main
+# thread's stack every few milliseconds, for a set number of minutes and writes the result to the
+# profiles folder for later analysis:
+#
+#   python -m pstats profiles/cprofile-20250101-120000.prof
+#   flamegraph.pl profiles/sample-20250101-120000.folded > flame.svg
+#
+# Profiling is started by the config at startup or by sending the display SIGUSR1
+# (pkill -USR1 -f temp_display.py).  A second SIGUSR1 stops it early.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import os
+import sys
+import time
+import signal
+import logging
+import cProfile
+import threading
+from collections import Counter
+
+from metrics import Histogram
+
+# Stage histogram bucket upper bounds, in seconds.  Stages range from microseconds (layout) to
+# seconds (a slow server).
+SPAN_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+PROFILE_FOLDER = 'profiles'
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+
+# Time between stack samples
+SAMPLE_SECONDS = 0.01
+
+
+class Spans:
+    # Stage name -> Histogram of its times.  Stages are timed back to back:
+    #
+    #   start = time.perf_counter()
+    #   ...
+    #   start = data.spans.mark('refresh.layout', start)
+    #   ...
+    #   data.spans.mark('refresh.draw', start)
+    def __init__(self, buckets=SPAN_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+
+    def mark(self, stage, start):
+        # stage began at start (time.perf_counter()) and has just finished.  Returns now, the start of
+        # the next stage.
+        now = time.perf_counter()
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = Histogram(self.buckets)
+        histogram.observe(now - start)
+        return now
+
+    def histograms(self):
+        # [(stage, Histogram)] in name order.  Safe to call from the metrics server's thread.
+        return sorted(self._histograms.copy().items())
+
+    def stats(self):
+        result = {}
+        for stage, histogram in self.histograms():
+            counts = list(histogram.counts)
+            count = sum(counts)
+
+            # Upper bound of the bucket the 95th percentile falls in
+            p95 = None
+            total = 0
+            for bound, bucket_count in zip(histogram.buckets + (float('inf'),), counts):
+                total += bucket_count
+                if total >= count * 0.95:
+                    p95 = bound
+                    break
+
+            result[stage] = {'count': count,
+                             'mean': histogram.sum / count if count else 0.0,
+                             'p95_under': p95}
+        return result
+
+    def log_stats(self):
+        for stage, s in self.stats().items():
+            logging.info('Stage %-18s count:%d mean:%.4fs p95 under:%ss', stage, s['count'], s['mean'], s['p95_under'])
+
+
+class Profiler:
+    # Runs one profile at a time on the main thread, for minutes, then writes it to folder.
+    def __init__(self, scheduler, mode=SAMPLE, minutes=10, folder=PROFILE_FOLDER):
+        if mode not in (CPROFILE, SAMPLE):
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        self.scheduler = scheduler
+        self.mode = mode
+        self.minutes = minutes
+        self.folder = folder
+
+        self._profile = None  # cProfile.Profile while one is running
+        self._sampler = None  # sampling thread while one is running
+        self._stacks = Counter()  # folded stack -> samples
+        self._stopping = threading.Event()
+        self._job_stop = None
+
+        # statistics
+        self.runs = 0
+        self.files = []
+
+    @property
+    def running(self):
+        return self._profile is not None or self._sampler is not None
+
+    def install_signal_handler(self):
+        # Must be called from the main thread.  SIGUSR1 starts a profile, or stops the one running.
+        # The scheduler runs the toggle as a job, so nothing happens inside the signal handler.
+        self.scheduler.add_signal_job(signal.SIGUSR1, 'profile', self.toggle)
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self):
+        # Must be called from the main thread, which is the one profiled
+        if self.running:
+            return
+        self.runs += 1
+        logging.info('Profiling (%s) for %s minutes', self.mode, self.minutes)
+
+        if self.mode == CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stacks = Counter()
+            self._stopping.clear()
+            self._sampler = threading.Thread(target=self._sample, args=(threading.main_thread().ident,),
+                                             name='profile_sampler', daemon=True)
+            self._sampler.start()
+
+        self._job_stop = self.scheduler.call_later('profile_stop', self.minutes * 60, self.stop)
+
+    def stop(self):
+        # Stops the running profile and writes it out.  Returns the file name, or None.
+        if not self.running:
+            return None
+        self.scheduler.cancel(self._job_stop)
+        self._job_stop = None
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            if self._profile is not None:
+                self._profile.disable()
+                filename = os.path.join(self.folder, f'cprofile-{stamp}.prof')
+                self._profile.dump_stats(filename)
+            else:
+                self._stopping.set()
+                self._sampler.join()
+                filename = os.path.join(self.folder, f'sample-{stamp}.folded')
+                with open(filename, 'w') as file:
+                    for stack, count in self._stacks.most_common():
+                        file.write(f'{stack} {count}\n')
+        except OSError as err:
+            logging.error('Could not write profile: %s', err)
+            filename = None
+        finally:
+            self._profile = None
+            self._sampler = None
+
+        if filename is not None:
+            self.files.append(filename)
+            logging.info('Profile written to %s', filename)
+        return filename
+
+    def _sample(self, thread_id):
+        # Records the thread's stack, root first, in the folded format flame graph tools read
+        while not self._stopping.wait(SAMPLE_SECONDS):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self._stacks[';'.join(reversed(stack))] += 1
+
+    def stats(self):
+        return {'runs': self.runs,
+                'files': len(self.files),
+                'running': self.running}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('Profiler runs:%d files written:%d', s['runs'], s['files'])
@@ -14,8 +14,13 @@
 
 import math
 
+import numpy as np
+
 MAGIC_COLORS =[1,1,1],[1,1,0],[1,0,0],[1,0.5,0],[0.163,0.373,0.6],[0.0,0.66,0.2],[0.5,0.0,0.5],[0.2,0.094,0.0]
 
+# Same magic colours as an (8, 3) array so all three channels interpolate at once
+MAGIC = np.array(MAGIC_COLORS, dtype=np.float64)
+
 def cubicInt(t, A, B):
       weight = t * t * (3 - 2 * t)
       return A + weight * (B - A)
@@ -53,6 +58,30 @@ def getB(iR, iY, iB, magic):
       y1 = cubicInt(iY, x2, x3)
       return cubicInt(iR, y0, y1)
 
+#   ryb2rgb_batch converts many colours at once
+#   *
+#   * @param ryb   {array} (N, 3) RYB values in the range 0..limit
+#   * @param limit {int}   [optional] max value of the color, defaults to 255
+#   *
+#   * returns an (N, 3) array of the RGB values, uint8 for the default limit
+#   * Results are identical to converting one at a time - the same floating point
+#   * operations are done in the same order, then rounded up like math.ceil.
+def ryb2rgb_batch(ryb, limit = 255):
+      limit = max(255,limit)
+      ryb = np.asarray(ryb, dtype=np.float64).reshape(-1, 3) / limit
+      # (N, 1) columns broadcast against the (3,) rows of magic colours giving (N, 3) per step
+      iR = ryb[:, 0:1]
+      iY = ryb[:, 1:2]
+      iB = ryb[:, 2:3]
+      x0 = cubicInt(iB, MAGIC[0], MAGIC[4])
+      x1 = cubicInt(iB, MAGIC[1], MAGIC[5])
+      x2 = cubicInt(iB, MAGIC[2], MAGIC[6])
+      x3 = cubicInt(iB, MAGIC[3], MAGIC[7])
+      y0 = cubicInt(iY, x0, x1)
+      y1 = cubicInt(iY, x2, x3)
+      rgb = np.ceil(cubicInt(iR, y0, y1) * limit)
+      return rgb.astype(np.uint8 if limit == 255 else np.int64)
+
 def ryb2rgb(R,Y,B, limit = 255):
       limit = max(255,limit)
       magic = MAGIC_COLORS
@@ -0,0 +1,277 @@
+# LED matrix temperature / UV display
+# Event-driven scheduler.  Owns every periodic job and sleeps between them.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import time
+import heapq
+import select
+import signal
+import socket
+import logging
+import itertools
+import threading
+
+# What to do when a periodic job runs so long that one or more of its deadlines have already passed
+SKIP = 'skip'  # drop the missed runs and wait for the next deadline on the original grid
+CATCH_UP = 'catch_up'  # run the missed deadlines back to back (up to max_catch_up of them), then resume the grid
+
+
+class JobStats:
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0  # runs that took longer than their time budget
+        self.skipped = 0  # deadlines dropped because a run went long
+        self.last_drift = 0.0  # seconds between when the job should have started and when it did
+        self.max_drift = 0.0
+        self.total_drift = 0.0
+        self.last_runtime = 0.0
+        self.max_runtime = 0.0
+        self.total_runtime = 0.0
+
+    def as_dict(self):
+        runs = max(self.runs, 1)
+        return {'runs': self.runs,
+                'errors': self.errors,
+                'overruns': self.overruns,
+                'skipped': self.skipped,
+                'last_drift': self.last_drift,
+                'max_drift': self.max_drift,
+                'mean_drift': self.total_drift / runs,
+                'last_runtime': self.last_runtime,
+                'max_runtime': self.max_runtime,
+                'mean_runtime': self.total_runtime / runs}
+
+
+class Job:
+    def __init__(self, name, interval, func, args, budget, overrun, max_catch_up, stats):
+        self.name = name
+        self.interval = interval  # seconds between runs.  None for a one-shot job.
+        self.func = func
+        self.args = args
+        self.budget = budget  # seconds a single run is allowed to take
+        self.overrun = overrun  # SKIP or CATCH_UP
+        self.max_catch_up = max_catch_up
+        self.deadline = None  # monotonic time of the next run
+        self.cancelled = False
+        self.stats = stats  # shared by every job of this name
+
+
+class Scheduler:
+    def __init__(self, clock=time.monotonic, sleep=None):
+        # clock and sleep can be swapped for a simulated clock, as the soak test does, to run days of
+        # jobs in minutes.  sleep(seconds) replaces waiting for the next deadline.
+        self.clock = clock
+        self.sleep = sleep
+        self._queue = []  # heap of (deadline, sequence, job)
+        self._sequence = itertools.count()  # tie breaker so jobs with the same deadline run in the order added
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._signal = None  # the signal that stopped the run loop, if one did
+        self._signal_jobs = {}  # signal number -> (name, func, args) to run when it arrives
+        self._signals_pending = []  # signal numbers received and not yet handed to their jobs
+
+        # The run loop sleeps in select() on one end of this socket pair.  Anything that needs it to
+        # look at the queue again writes a byte to the other end.  A socket pair rather than a pipe
+        # so it works with select() and set_wakeup_fd() on Windows too.
+        self._wakeup_read, self._wakeup_write = socket.socketpair()
+        self._wakeup_read.setblocking(False)
+        self._wakeup_write.setblocking(False)
+        self._stats = {}  # name -> JobStats, added up over every job of that name
+        self._budget_end = None  # monotonic time the running job must be finished by
+
+    def add_job(self, name, interval, func, *args, delay=0.0, budget=None, overrun=SKIP, max_catch_up=3):
+        # Run func(*args) every interval seconds, the first time after delay seconds.
+        # Deadlines are fixed on a monotonic grid (start + n * interval) so the period does not
+        # drift by however long each run takes.  The budget defaults to the interval itself.
+        # If func returns a number, that many seconds from the end of the run is used for the
+        # next deadline instead (jobs that pick their own pace, like the adaptive poller).
+        job = Job(name, interval, func, args, budget if budget is not None else interval, overrun, max_catch_up,
+                  self._job_stats(name))
+        self._push(job, self.clock() + delay)
+        return job
+
+    def call_later(self, name, delay, func, *args, budget=None):
+        # Run func(*args) once after delay seconds.
+        job = Job(name, None, func, args, budget, SKIP, 0, self._job_stats(name))
+        self._push(job, self.clock() + delay)
+        return job
+
+    def cancel(self, job):
+        # Cancelled jobs are simply dropped when they reach the front of the queue
+        if job is not None:
+            job.cancelled = True
+
+    def stop(self):
+        self._stopping = True
+        self._wake()
+
+    def time_left(self):
+        # Seconds remaining in the running job's time budget.  Long operations (network calls)
+        # use this to cap their own timeouts so one run cannot eat into the next.
+        if self._budget_end is None:
+            return None
+        return max(0.0, self._budget_end - self.clock())
+
+    def stats(self):
+        # Also called from the metrics server's thread, while jobs are being added.  One-shot jobs
+        # (show_UV, profile_stop) are added again and again under the same name and their counts
+        # carry on from the last one, so they only ever go up.
+        with self._lock:
+            stats = list(self._stats.items())
+        return {name: job_stats.as_dict() for name, job_stats in stats}
+
+    def log_stats(self):
+        for name, s in self.stats().items():
+            logging.info('Job %-12s runs:%d errors:%d overruns:%d skipped:%d drift mean/max:%.3f/%.3fs '
+                         'runtime mean/max:%.3f/%.3fs',
+                         name, s['runs'], s['errors'], s['overruns'], s['skipped'],
+                         s['mean_drift'], s['max_drift'], s['mean_runtime'], s['max_runtime'])
+
+    def install_signal_handlers(self):
+        # Must be called from the main thread.  SIGINT / SIGTERM stop the run loop cleanly.
+        # Python writes a byte to the wakeup socket as soon as any signal arrives, so the handler
+        # itself only has to set a flag.
+        signal.set_wakeup_fd(self._wakeup_write.fileno(), warn_on_full_buffer=False)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._on_signal)
+
+    def add_signal_job(self, signum, name, func, *args):
+        # Must be called from the main thread.  Runs func(*args) as a one-shot job each time signum
+        # arrives.  The handler only notes the signal.  The run loop adds the job.
+        self._signal_jobs[signum] = (name, func, args)
+        signal.set_wakeup_fd(self._wakeup_write.fileno(), warn_on_full_buffer=False)
+        signal.signal(signum, self._on_job_signal)
+
+    def _on_signal(self, signum, frame):
+        # Runs in the middle of whatever the main thread was doing, possibly holding the scheduler's
+        # lock or logging's, so it takes no locks itself.  The run loop logs the signal as it exits.
+        self._signal = signum
+        self._stopping = True
+
+    def _on_job_signal(self, signum, frame):
+        # list.append takes no lock that the interrupted main thread could be holding
+        self._signals_pending.append(signum)
+
+    def _start_signal_jobs(self):
+        while self._signals_pending:
+            name, func, args = self._signal_jobs[self._signals_pending.pop(0)]
+            self.call_later(name, 0, func, *args)
+
+    def _wake(self):
+        try:
+            self._wakeup_write.send(b'\0')
+        except OSError:
+            pass  # the socket buffer is full so the run loop is already due to wake
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_read.recv(4096):
+                pass
+        except OSError:
+            pass  # nothing more to read
+
+    def _job_stats(self, name):
+        with self._lock:
+            return self._stats.setdefault(name, JobStats())
+
+    def _push(self, job, deadline):
+        job.deadline = deadline
+        with self._lock:
+            heapq.heappush(self._queue, (deadline, next(self._sequence), job))
+        # A job added from another thread may now be the earliest so wake the run loop up to re-check.
+        self._wake()
+
+    def _next_due(self):
+        # Returns the next job that is due to run, or the number of seconds to sleep until one is.
+        with self._lock:
+            while self._queue and self._queue[0][2].cancelled:
+                heapq.heappop(self._queue)
+
+            if not self._queue:
+                return None, None
+
+            deadline, _, job = self._queue[0]
+            now = self.clock()
+            if deadline > now:
+                return None, deadline - now
+
+            heapq.heappop(self._queue)
+            return job, 0.0
+
+    def _next_deadline(self, job, now):
+        # Next point on the job's fixed grid, applying its overrun rule if we have fallen behind.
+        deadline = job.deadline + job.interval
+        if deadline > now:
+            return deadline
+
+        missed = int((now - deadline) // job.interval) + 1
+        if job.overrun == CATCH_UP and missed <= job.max_catch_up:
+            return deadline
+
+        # Too far behind (or skipping anyway).  Drop the missed runs and stay on the original grid.
+        job.stats.skipped += missed
+        logging.warning('Job "%s" fell behind.  Skipping %d missed run(s).', job.name, missed)
+        return deadline + missed * job.interval
+
+    def _run_job(self, job):
+        stats = job.stats
+        start = self.clock()
+        stats.last_drift = start - job.deadline
+        stats.max_drift = max(stats.max_drift, stats.last_drift)
+        stats.total_drift += stats.last_drift
+
+        self._budget_end = start + job.budget if job.budget is not None else None
+        next_delay = None
+        try:
+            result = job.func(*job.args)
+            if isinstance(result, (int, float)) and not isinstance(result, bool):
+                next_delay = result
+        except Exception as err:
+            # Never let one failed run kill the schedule.  Log it and carry on.
+            stats.errors += 1
+            logging.exception('Unhandled exception in scheduled job "%s": %s', job.name, err)
+        finally:
+            self._budget_end = None
+
+        end = self.clock()
+        stats.runs += 1
+        stats.last_runtime = end - start
+        stats.max_runtime = max(stats.max_runtime, stats.last_runtime)
+        stats.total_runtime += stats.last_runtime
+
+        if job.budget is not None and stats.last_runtime > job.budget:
+            stats.overruns += 1
+            logging.warning('Job "%s" overran its %.1fs budget.  Took %.1fs.', job.name, job.budget, stats.last_runtime)
+
+        return end, next_delay
+
+    def run(self):
+        # Runs in the calling thread until stop() is called or a signal is received.
+        # Between jobs the thread sleeps until the next deadline rather than spinning.
+        while not self._stopping:
+            self._start_signal_jobs()
+            job, sleep_for = self._next_due()
+
+            if job is None:
+                if self.sleep is not None:
+                    if sleep_for is None:
+                        break  # nothing left to run and nothing to wait for
+                    self.sleep(sleep_for)
+                    continue
+                select.select([self._wakeup_read], [], [], sleep_for)
+                self._drain_wakeup()
+                continue
+
+            end, next_delay = self._run_job(job)
+
+            if job.interval is not None and not job.cancelled:
+                if next_delay is not None:
+                    self._push(job, end + next_delay)
+                else:
+                    self._push(job, self._next_deadline(job, end))
+
+        if self._signal is not None:
+            logging.info('Received signal %d.  Stopped scheduler.', self._signal)
@@ -0,0 +1,194 @@
+# LED matrix temperature / UV display
+# Sunrise / sunset cache.  Today's times for each horizon are solved once per day instead of
+# on every call.  Optionally they come from a yearly table built ahead of time so the display
+# does not need ephem at all on the hot path.
+#
+# To build a table for the coming year (run from the LED_matrix folder):
+#
+#   python suntimes.py --year 2026
+#
+# then set "sun_table": "sun-table.json" in the locale section of config.json.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+
+# Days between the ephem epoch (1899/12/31 12:00 UTC) and the Unix epoch.  ephem dates are plain
+# floats counting days from its epoch, so "now" can be worked out without importing ephem.
+EPHEM_UNIX_EPOCH = 25567.5
+
+# Markers stored in place of the times for very high +/- latitudes
+NEVER_UP = 'never_up'
+ALWAYS_UP = 'always_up'
+
+
+def ephem_now():
+    return time.time() / 86400.0 + EPHEM_UNIX_EPOCH
+
+
+def solve(lat, lon, horizon):
+    # Today's sunrise and sunset (as ephem dates) for this horizon, or one of the markers above.
+    import ephem
+
+    my_location = ephem.Observer()
+
+    my_location.lat = lat
+    my_location.lon = lon
+    my_location.horizon = horizon
+
+    sun = ephem.Sun()
+
+    current = ephem.now()
+
+    try:
+        sunrise = my_location.next_rising(sun)
+        sunset = my_location.next_setting(sun)
+
+        # if the next sunrise and/or sunset is now tomorrow, then we need to get the previous one (= today's)
+        # so that this always returns today's sunrise and sunset regardless as to the current time of day
+        if ephem.localtime(sunrise).day != ephem.localtime(current).day:
+            sunrise = my_location.previous_rising(sun)
+
+        if ephem.localtime(sunset).day != ephem.localtime(current).day:
+            sunset = my_location.previous_setting(sun)
+
+        return float(sunrise), float(sunset)
+
+    # And just in case you are in a very high +/- latitude
+    except ephem.NeverUpError:
+        return NEVER_UP
+
+    except ephem.AlwaysUpError:
+        return ALWAYS_UP
+
+
+class SunTimes:
+    def __init__(self, lat, lon, table_file=None):
+        self.lat = lat
+        self.lon = lon
+        self._day = None  # local date the cache holds
+        self._cache = {}  # horizon -> (sunrise, sunset) or a marker
+        self._table = {}  # horizon -> {ISO date -> (sunrise, sunset) or a marker}
+
+        if table_file:
+            self._load_table(table_file)
+
+        # statistics
+        self.solves = 0
+        self.table_hits = 0
+
+    def _load_table(self, table_file):
+        try:
+            with open(table_file, "r") as file:
+                table = json.load(file)
+        except (OSError, ValueError) as err:
+            logging.warning('Could not read sun table %s: %s.  Using ephem.', table_file, err)
+            return
+
+        if (table.get("latitude"), table.get("longitude")) != (self.lat, self.lon):
+            logging.warning('Sun table %s is for a different location.  Using ephem.', table_file)
+            return
+
+        self._table = {horizon: {day: (times if isinstance(times, str) else tuple(times))
+                                 for day, times in days.items()}
+                       for horizon, days in table["horizons"].items()}
+
+    def get(self, horizon):
+        # Returns sunrise, sunset, current as ephem dates (floats), the same as solving it each time.
+        horizon = str(horizon)
+        current = ephem_now()
+
+        today = datetime.now().date()
+        if today != self._day:
+            # New day (or first call).  Everything cached is yesterday's.
+            self._day = today
+            self._cache = {}
+
+        times = self._cache.get(horizon)
+        if times is None:
+            times = self._table.get(horizon, {}).get(today.isoformat())
+            if times is not None:
+                self.table_hits += 1
+            else:
+                times = solve(self.lat, self.lon, horizon)
+                self.solves += 1
+            self._cache[horizon] = times
+
+        if times == NEVER_UP:
+            return current + 1, current - 1, current
+        if times == ALWAYS_UP:
+            return current - 1, current + 1, current
+
+        sunrise, sunset = times
+        return sunrise, sunset, current
+
+
+def build_table(lat, lon, horizons, year):
+    # Solve every day of the year for each horizon, as if asked at local noon that day.
+    import ephem
+
+    table = {"latitude": lat, "longitude": lon, "horizons": {}}
+    for horizon in horizons:
+        days = {}
+        day = date(year, 1, 1)
+        while day.year == year:
+            noon = datetime(day.year, day.month, day.day, 12)
+            my_location = ephem.Observer()
+            my_location.lat = lat
+            my_location.lon = lon
+            my_location.horizon = horizon
+            my_location.date = ephem.Date(noon.timestamp() / 86400.0 + EPHEM_UNIX_EPOCH)
+            sun = ephem.Sun()
+            try:
+                sunrise = my_location.previous_rising(sun)
+                sunset = my_location.next_setting(sun)
+
+                # Keep the same "today's times" rule as solve()
+                if ephem.localtime(sunrise).date() != day:
+                    sunrise = my_location.next_rising(sun)
+                if ephem.localtime(sunset).date() != day:
+                    sunset = my_location.previous_setting(sun)
+
+                days[day.isoformat()] = [float(sunrise), float(sunset)]
+            except ephem.NeverUpError:
+                days[day.isoformat()] = NEVER_UP
+            except ephem.AlwaysUpError:
+                days[day.isoformat()] = ALWAYS_UP
+            day += timedelta(days=1)
+
+        table["horizons"][horizon] = days
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a yearly sunrise / sunset table for the display.")
+    parser.add_argument("--year", type=int, default=datetime.now().year + 1)
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--output", default="sun-table.json")
+    args = parser.parse_args()
+
+    with open(args.config) as file:
+        locale = json.load(file)["locale"]
+
+    # Same strings the display uses for its lookups
+    lat = str(locale["latitude"])
+    lon = str(locale["longitude"])
+    horizon = str(locale["horizon"])
+
+    # The true horizon and civil twilight (6 degrees below), matching what the display asks for
+    horizons = [horizon, str(float(horizon) - 6.0)]
+
+    with open(args.output, "w") as file:
+        json.dump(build_table(lat, lon, horizons, args.year), file)
+
+    print(f'Wrote {args.output} for {args.year}')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# LED matrix temperature / UV display
+# Adafruit IO telemetry uploader.  Metrics are queued by the main thread and sent by a background
+# worker so a slow or unreachable io.adafruit.com can never hold up fetching or drawing the weather.
+#
+# Each metric goes to its own feed, named after the configured feed key, e.g. "display-cpu-temperature".
+# Adafruit IO creates the feeds on the first upload.  The heartbeat metric (the CPU temperature) is
+# also sent to the configured feed itself, so inactivity alerts set up on it before the metrics had
+# feeds of their own keep working.  On a host that cannot read its CPU temperature, HEARTBEAT_FALLBACK
+# is sent to the configured feed instead, so those alerts still only fire when the display is down.
+# Values queued while the server could not be reached are sent later in batches, one request per
+# feed, with their original times.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+import requests
+
+from http_client import HttpClient
+
+DEFAULT_URL = "https://io.adafruit.com"
+
+# Values held while the server cannot be reached.  Six metrics and the heartbeat every 10 minutes is
+# about 6 hours' worth.  When full, the oldest values are dropped.
+QUEUE_SIZE = 256
+
+# Most values sent in one upload
+BATCH_SIZE = 60
+
+# Metric also sent to the configured feed, to show the display is still running
+HEARTBEAT = 'cpu-temperature'
+
+# Sent to the configured feed when the heartbeat metric has no value
+HEARTBEAT_FALLBACK = 0
+
+# Wait before retrying a failed upload, doubling after each failure
+RETRY_MIN_SECONDS = 30
+RETRY_MAX_SECONDS = 15 * 60
+
+
+class TelemetryUploader:
+    def __init__(self, user, key, feed, base_url=DEFAULT_URL, metrics=None, heartbeat=HEARTBEAT,
+                 queue_size=QUEUE_SIZE, connect_timeout=5, read_timeout=20):
+        self.user = user
+        self.key = key
+        self.feed = feed
+        self.metrics = metrics  # names of the metrics that get feeds of their own.  None for all of them.
+        self.heartbeat = heartbeat
+        self.base_url = base_url.rstrip('/')
+
+        self._queue = deque()  # (feed key, value, ISO time) oldest first
+        self._queue_size = queue_size
+        self._lock = threading.Condition()
+        self._stopping = False
+        self._retry_delay = RETRY_MIN_SECONDS
+        self._thread = None
+
+        # Only the worker thread uses this, so it gets its own session
+        self.http = HttpClient(connect_timeout, read_timeout, pool_size=1)
+
+        # statistics
+        self.sent = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failures = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        # Give the worker a few seconds to send what is queued, then give up on it
+        with self._lock:
+            self._stopping = True
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return  # still waiting on the server.  It is a daemon thread so it will not hold up exit.
+        self.http.close()
+
+    def put(self, metrics):
+        # Queues {metric name: number}.  Never blocks on the network.
+        created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        with self._lock:
+            # The configured feed always gets a value, even when the heartbeat metric has none
+            heartbeat = metrics.get(self.heartbeat)
+            self._queue.append((self.feed, heartbeat if heartbeat is not None else HEARTBEAT_FALLBACK, created_at))
+
+            for name, value in metrics.items():
+                if value is None:
+                    continue
+                if self.metrics is None or name in self.metrics:
+                    self._queue.append((self.feed + '-' + name, value, created_at))
+            self._trim()
+            self._lock.notify()
+
+    def _trim(self):
+        # Called with the lock held
+        while len(self._queue) > self._queue_size:
+            self._queue.popleft()
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._stopping:
+                    self._lock.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(BATCH_SIZE, len(self._queue)))]
+
+            unsent = self._upload(batch)
+
+            if unsent:
+                with self._lock:
+                    # Back to the front of the queue, still oldest first
+                    self._queue.extendleft(reversed(unsent))
+                    self._trim()
+                    if self._stopping:
+                        return
+
+                    logging.info('Telemetry upload failed.  Retrying in %d seconds.', self._retry_delay)
+                    retry_at = time.monotonic() + self._retry_delay
+                    while not self._stopping and time.monotonic() < retry_at:
+                        self._lock.wait(retry_at - time.monotonic())
+                    self._retry_delay = min(self._retry_delay * 2, RETRY_MAX_SECONDS)
+            else:
+                self._retry_delay = RETRY_MIN_SECONDS
+
+    def _upload(self, batch):
+        # Sends a batch, one request per feed.  Returns whatever should be tried again later.
+        feeds = {}
+        for item in batch:
+            feeds.setdefault(item[0], []).append(item)
+
+        unsent = []
+        for feed_key, items in feeds.items():
+            if unsent:
+                # The server is having trouble.  Don't keep trying the rest of the feeds now.
+                unsent.extend(items)
+                continue
+
+            url = f'{self.base_url}/api/v2/{self.user}/feeds/{feed_key}/data/batch'
+            body = {'data': [{'value': value, 'created_at': created_at} for _, value, created_at in items]}
+            try:
+                response = self.http.post(url, 'adafruit_io', json=body, headers={'X-AIO-Key': self.key})
+                response.close()
+            except requests.exceptions.RequestException:
+                self.failures += 1
+                unsent.extend(items)
+                continue
+
+            if response.status_code in (200, 201):
+                self.sent += len(items)
+            elif response.status_code == 429 or response.status_code >= 500:
+                # Throttled or the server is down.  Try again later.
+                self.failures += 1
+                unsent.extend(items)
+            else:
+                # Bad key, unknown user and the like.  Retrying will not help.
+                self.rejected += len(items)
+                logging.warning('Adafruit IO rejected %d values for %s.  HTTP %d',
+                                len(items), feed_key, response.status_code)
+
+        return unsent
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._queue)
+        return {'sent': self.sent,
+                'queued': queued,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'failures': self.failures}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('Telemetry sent:%d queued:%d dropped:%d rejected:%d failed uploads:%d',
+                     s['sent'], s['queued'], s['dropped'], s['rejected'], s['failures'])
+        self.http.log_stats()
@@ -4,35 +4,63 @@
 # Copyright (c) 2025 by Russell Ingleton
 
 import time
+
+# Start of the startup timing.  Everything after this line counts as import time.
+STARTED = time.monotonic()
+
 from datetime import datetime
 import os
 import sys
 import json
-import colorsys
-import ryb2rgb
 import requests
-from requests.exceptions import ConnectionError
-import threading
 import argparse
-from rgbmatrix import RGBMatrix, RGBMatrixOptions, graphics
-import board
-import adafruit_veml7700
-import busio
-import ephem
 import textwrap
 import logging
 import shutil
-
-# All of these are for various testing
-import pynput
-from pynput import keyboard 
+import hashlib
+import urllib.parse
+import scheduler
+from scheduler import Scheduler
+from http_client import HttpClient
+from polling import AdaptivePoller
+from colours import ColourTable, uv_colour, uv_colour_array
+from text_extents import TextExtents
+import glyph_atlas
+from glyph_atlas import FrameComposer
+import frame_diff
+from frame_diff import FrameState
+from suntimes import SunTimes
+from light_sensor import LightSensor
+import telemetry
+from telemetry import TelemetryUploader
+from network_watchdog import NetworkWatchdog
+from observation import loads, parse_v1, parse_v2, find_station, fahrenheit_to_celsius
+from weatherlink_live import LocalStation
+from history import HistoryStore
+import trend
+from trend import RecentReadings, sparkline
+from metrics import MetricsServer, Histogram, RENDER_BUCKETS
+import profiling
+from profiling import Spans, Profiler
+
+# Used by the keyboard listener for testing.  The optional subsystems (psutil and gpiozero for the
+# status message and IoT feeds, pynput, ephem and the light sensor libraries) are imported where they
+# are used, and only if the config turns them on, so they don't slow down startup.
 import functools
-import psutil  # for memory testing
-from gpiozero import CPUTemperature  # for testing.  CPU temperature monitoring
 
-# For Adafruit IoT feed that montiors CPU temp but also acts as a warning
-# if the feed stops receiving information
-from Adafruit_IO import Client, RequestError
+# Set by load_backend().  Either the real rpi-rgb-led-matrix library or the in-memory emulator.
+RGBMatrix = RGBMatrixOptions = graphics = None
+
+
+def load_backend(name):
+    # "hardware" drives the LED panels through the rpi-rgb-led-matrix library.
+    # "emulator" draws into NumPy arrays so the display can run and be profiled without a Pi.
+    global RGBMatrix, RGBMatrixOptions, graphics
+
+    if name == "emulator":
+        from matrix_emulator import RGBMatrix, RGBMatrixOptions, graphics
+    else:
+        from rgbmatrix import RGBMatrix, RGBMatrixOptions, graphics
 
 
 def args():
@@ -87,6 +115,9 @@ def args():
                         help="Don't drop privileges from 'root' after initializing the hardware.", action='store_false')
     parser.set_defaults(drop_privileges=True)
 
+    parser.add_argument("--backend", action="store", help="Display backend: hardware or emulator. (Default: hardware)",
+                        default="hardware", choices=["hardware", "emulator"], type=str)
+
     return parser.parse_args()
 
 
@@ -133,9 +164,7 @@ def led_matrix_options(args):
 
 
 class Config:
-    def __init__(self):
-
-        filename = "config.json"
+    def __init__(self, filename="config.json"):
 
         if os.path.isfile(filename):
             try:
@@ -159,7 +188,48 @@ class Config:
         self.davis_secret = jdata["OR_davis_console_interface"]["api_secret"]
         self.davis_station_name = jdata["OR_davis_console_interface"]["station_name"]
 
-        if self.davis_user == "" and self.davis_key == "":
+        # Optionally, a WeatherLink Live on the local network.  Read every few seconds in preference to
+        # either of the above, which are only used while it cannot be reached.  This section is optional.
+        self.davis_local_host = jdata.get("davis_weatherlink_live_interface", {}).get("host", "")
+        self.use_cloud = self.davis_user != "" or self.davis_key != ""
+
+        # Timeouts for the Davis server.  This section is optional so older config files still work.
+        network = jdata.get("network", {})
+        self.connect_timeout = network.get("connect_timeout_seconds", 5)
+        self.read_timeout = network.get("read_timeout_seconds", 20)
+
+        # Only ever changed to point the display at a local stand-in server for testing
+        self.weatherlink_url = network.get("weatherlink_url", "https://api.weatherlink.com")
+
+        # Restarted by the connectivity watchdog when the Davis server cannot be reached.  Rebooting
+        # the Pi is off unless a number of minutes without network is given.
+        self.network_interface = network.get("interface", "wlan0")
+        self.reboot_after_minutes = network.get("reboot_after_minutes", 0)
+
+        # How long readings are kept in the history file.  This section is optional.
+        self.history_retention_days = jdata.get("history", {}).get("retention_days", 366)
+
+        # Metrics endpoint for Prometheus or a browser.  This section is optional.  Port 0 turns it off.
+        metrics = jdata.get("metrics", {})
+        self.metrics_port = metrics.get("port", 0)
+        self.metrics_address = metrics.get("address", "")  # all interfaces
+
+        # Profiling, for when a display misbehaves.  This section is optional.  A profile is taken at
+        # startup if asked for here, or whenever the display is sent SIGUSR1.
+        profile = jdata.get("profiling", {})
+        self.profile_mode = profile.get("mode", profiling.SAMPLE)  # or cprofile
+        if self.profile_mode not in (profiling.SAMPLE, profiling.CPROFILE):
+            logging.warning('Unknown profiling mode "%s".  Using "%s".', self.profile_mode, profiling.SAMPLE)
+            self.profile_mode = profiling.SAMPLE
+        self.profile_minutes = profile.get("minutes", 10)
+        self.profile_at_start = profile.get("at_start", False)
+
+        # How often the Davis server gets new data.  The legacy V1 device uploads every minute and the
+        # V2 free tier every 15 minutes.  The poller learns faster (paid) rates on its own.
+        self.data_update_interval = network.get("data_update_interval_seconds",
+                                                60 if self.davis_user != "" else 15 * 60)
+
+        if not self.use_cloud and self.davis_local_host == "":
             logging.critical('You must specify user account credentials for at least one interface in the configuration file: %s',
                              filename)
             exit(1)
@@ -187,16 +257,26 @@ class Config:
         if self.hi_lo_temp_length_seconds > 55:
             self.hi_lo_temp_length_seconds = 55
 
+        # Optional 24 hour trend pane, shown for the last few seconds of each minute.  0 turns it off.
+        self.trend_length_seconds = min(jdata.get("trend", {}).get("length_seconds", 0), 55)
+
         # Using Adafruit IO feed to upload statistics and monitor if down.
         self.adafruitIO_user = jdata["adafruit_IO"]["user"]
         self.adafruitIO_key = jdata["adafruit_IO"]["key"]
         self.adafruitIO_feed = jdata["adafruit_IO"]["feed"]
+        self.adafruitIO_metrics = jdata["adafruit_IO"].get("metrics")  # None sends every statistic
+        self.use_adafruitIO = self.adafruitIO_user != "" and self.adafruitIO_key != ""
+        # Only ever changed to point the uploads at a local stand-in server for testing
+        self.adafruitIO_url = jdata["adafruit_IO"].get("url", telemetry.DEFAULT_URL)
 
         # Longitude, latitude location.  Used to determine sunrise / sunset.
         self.my_location_lat = str(jdata["locale"]["latitude"])
         self.my_location_lon = str(jdata["locale"]["longitude"])
         self.my_location_horizon = str(jdata["locale"]["horizon"])
 
+        # Optional yearly sunrise / sunset table built with suntimes.py
+        self.sun_table = jdata["locale"].get("sun_table", "")
+
         # This sets the max and min temperatures for what will be the most red (hot) and
         # most purple (cold) colors.  Values beyond these will stay at their max color.
         # Set appropriately for your locale
@@ -213,525 +293,479 @@ class Data:
 
         self.temp_now = None
         self.UV = None
-        self.show_hi_low_temp = False
+        self.observed_at = None  # epoch time of the last observation fetched.  None if the last fetch failed.
+        self.last_result = (0, "Waiting for data")  # (success, message) from the last get_temp()
+        self.show_hi_lo_temp = False
+        self.show_trend = False  # trend pane in place of the high / low or UV
         self.after_hours = False  # to keep track of opening / closing hours
         self.error_count = 5  # to keep track of consecutive API failures
         self.master_error_count = 0  # for testing purposes.  Overall # of API errors.  Prints in log file.
         self.start_time = datetime.now()
 
-        # timer threads
-        self.timer_main = None
-        self.timer_blink = None
-        self.timer_show_UV = None
+        # Scheduler and the jobs it runs.  Set up in run()
+        self.scheduler = None
+        self.profiler = None
+        self.job_blink = None
+        self.job_show_UV = None
+        self.job_show_trend = None
+
+        # Decides when to next fetch data from the Davis server
+        self.poller = AdaptivePoller(self.config.data_update_interval)
 
         self.canvas = self.matrix.CreateFrameCanvas()
 
-        # Load our fonts
-        self.font_small = graphics.Font()
-        self.font_small.LoadFont("./fonts/4x6.bdf")
-        self.font_med = graphics.Font()
-        self.font_med.LoadFont("./fonts/8x13B.bdf")
-        self.font_large = graphics.Font()
-        self.font_large.LoadFont("./fonts/Helvetica38.bdf")
-        self.font_msg = graphics.Font()
-        self.font_msg.LoadFont("./fonts/7x13.bdf")
+        # Load our fonts.  Each is a glyph atlas holding just the characters we show, compiled from the
+        # BDF file on the first start and read from the font cache after that.
+        self.font_small = glyph_atlas.load("./fonts/4x6.bdf")
+        self.font_med = glyph_atlas.load("./fonts/8x13B.bdf")
+        self.font_large = glyph_atlas.load("./fonts/Helvetica38.bdf")
+        self.font_msg = glyph_atlas.load("./fonts/7x13.bdf", glyph_atlas.MESSAGE_CHARACTERS)
+
+        # Each frame is put together here and pushed to the canvas in one go
+        self.composer = FrameComposer(self.canvas.width, self.canvas.height)
+
+        # Today's sunrise and sunset times
+        self.sun_times = SunTimes(self.config.my_location_lat, self.config.my_location_lon, self.config.sun_table)
+
+        # Pixel widths of the strings we draw, for the layout
+        self.text_extents = TextExtents()
+
+        # What the canvas was last drawn from, so unchanged frames are not drawn again
+        self.frame_state = FrameState()
+        self.render_time = Histogram(RENDER_BUCKETS)  # of frames actually drawn
+        self.spans = Spans()  # time taken by each stage of fetching and drawing
 
         # Used for text titles
         self.title_color = graphics.Color(255, 255, 255)  # white
 
-        filename = "high-lows.data"
+        # Temperature colours.  Built from the config on first use.
+        self.colour_table = None
 
-        if os.path.isfile(filename):
-            with open(filename, "r") as file:
-                data = file.read().replace('\n', '')
-                self.hi_low_date, self.temp_high, self.temp_low = map(float, data.split(" "))
+        # Every reading is kept in the history file, which also gives today's high and low after a restart
+        self.history = HistoryStore(HISTORY_FILE, self.config.history_retention_days)
+        self.history.compact()
+        import_high_lows(self)
+        update_high_low(self)
 
-        else:  # no file.  Fake hi/low date to be outdated.
-            self.hi_low_date = datetime.now().timetuple().tm_yday - 1
-            self.temp_high = self.temp_low = None
+        # The last 24 hours of readings for the trend pane, starting with those in the history file
+        self.recent = RecentReadings()
+        recent = self.history.records(time.time() - trend.SPAN_SECONDS)
+        temps = recent['temp']
+        if self.config.use_Celsius:
+            temps = ((temps - 32) * 5 / 9).round(1)
+        self.recent.extend(recent['ts'], temps, recent['uv'])
+
+        # V2 API station ID.  Cached on disk next to the history file.
+        load_station_id(self)
 
         self.light = None
-        self.lux_sensor_available = False 
+        self.target_brightness = None  # where ramp_brightness() is heading
+        self.brightness_override = None  # set from the keyboard for testing
+        self.light_sensor = None
+        self.cpu_sensor = None  # opened on first use.  False if there is none.
         if self.config.use_sensor:
-            try:
-                self.i2c = board.I2C()
+            # One long-lived sensor handle, sampled by the scheduler.  Opened on its first sample.
+            self.light_sensor = LightSensor()
+
+        # One pooled, keep-alive HTTP session shared by every call to the Davis server
+        self.http = HttpClient(self.config.connect_timeout, self.config.read_timeout)
 
-                # Grab first reading to ensure sensor is available
-                sensor = adafruit_veml7700.VEML7700(self.i2c)
-                self.lux_sensor_available = True
+        # Read in preference to the Davis server if there is one
+        self.local = LocalStation(self.config.davis_local_host) if self.config.davis_local_host else None
+        self.source = None  # 'local' or 'cloud', whichever get_temp() last used
+
+        # Works out what to do when the Davis server cannot be reached.  Started in run().  Without a
+        # Davis account it watches the WeatherLink Live instead.
+        if self.config.use_cloud:
+            url = urllib.parse.urlparse(self.config.weatherlink_url)
+        else:
+            url = urllib.parse.urlparse(self.local.url)
+        self.watchdog = NetworkWatchdog(url.hostname, url.port or (80 if url.scheme == 'http' else 443),
+                                        self.config.network_interface, self.config.reboot_after_minutes)
 
-            except:
-                logging.warning('Light sensor not found or not connected, falling back to software mode.')
+        # Uploads the IoT feeds from a background thread.  Started in run().
+        self.telemetry = None
+        if self.config.use_adafruitIO:
+            self.telemetry = TelemetryUploader(self.config.adafruitIO_user, self.config.adafruitIO_key,
+                                               self.config.adafruitIO_feed, self.config.adafruitIO_url,
+                                               self.config.adafruitIO_metrics,
+                                               connect_timeout=self.config.connect_timeout,
+                                               read_timeout=self.config.read_timeout)
 
-        # create a REST client instance for the IoT feed
-        self.io_client = Client(self.config.adafruitIO_user, self.config.adafruitIO_key)
+        # Time taken by each step of starting up.  Set in run() and logged with the first data shown.
+        self.startup = None
+
+
+# Counts and logs a failed fetch.  message is added below the error counts.
+def count_error(data, level, message, *args):
+    data.error_count += 1
+    data.master_error_count += 1
+    logging.log(level, 'Consecutive error count: %d.  Total error count: %d.\n'
+                '                     ' + message, data.error_count, data.master_error_count, *args)
+
+
+# The result get_temp returns after an error that is only shown once it has happened 6 times in a row
+def error_result(data, message, warning=(1, "Warning")):
+    if data.error_count > 5:
+        return (0, message)
+    return warning
+
+
+# Converts a Fahrenheit temperature from Davis to the units shown.  None stays None.
+def display_temp(data, temp):
+    if data.config.use_Celsius:
+        return fahrenheit_to_celsius(temp)
+    return temp
 
 
 # This function will get all temperature values and store for use
 def get_temp(data):
 
+    # Set when we have an observation.  Used by the poller to time the next fetch.
+    data.observed_at = None
+
+    # A WeatherLink Live on the local network comes first.  The Davis server is the fallback.
+    if data.local is not None and data.local.due(time.time()):
+        observation, error = fetch_local(data)
+        if error:
+            return error
+        if observation is not None:
+            return use_observation(data, observation, 'local')
+
+    data.source = 'cloud'
+
     # Use the V1 API if a username was specified in the config file.
-    if data.config.davis_user != "":
-        DAVIS_V1_API_BASE = "https://api.weatherlink.com/v1/NoaaExt.json?user="
-        DAVIS_V1_API_URL = DAVIS_V1_API_BASE + data.config.davis_user + "&pass=" + data.config.davis_password
+    v1 = data.config.davis_user != ""
 
-        try:
-            response = requests.get(DAVIS_V1_API_URL)
-            
-            # Force close to free resources / stop slow memory leak
-            response.close()
-
-            if response.status_code == 200:
-                if response.text == 'Invalid Request!':
-                    data.error_count += 1
-                    data.master_error_count += 1
-                    logging.critical('Consecutive error count: %d.  Total error count: %d.\n'
-                                  '                     Possible invalid Davis WeatherlinkIP username or password.\n'
-                                  '                     Verify credentials and check config.json file.',
-                                  data.error_count, data.master_error_count)
-
-                    # This is likely a permanent error until fixed.  We will always return a failure regardless as to error count
-                    return (0, "Possible invalid Weatherlink user name or password")
-
-                else:  # We have a valid V1 response request
-                    try:
-                        results = response.json()
-                        
-                        # Set defaults in case no valid temp or UV readings returned.
-                        data.temp_now = data.UV = None
-                        data.temp_high = -999
-                        data.temp_low = 999
-                        
-                        try:
-                            age = int(results['davis_current_observation']['observation_age'])
-                            if age > (5 * 60):  # if data is older than 5 minutes
-                                data.error_count += 1
-                                data.master_error_count += 1
-                                logging.warning('Consecutive error count: %d.  Total error count: %d.\n'
-                                                '                     Outdated data.  Data is %d minutes old.\n'
-                                                '                     Check the local Davis Weatherlink transmitter device and its network\n'
-                                                '                     connectivity.  There is nothing wrong with this display system!',
-                                                data.error_count, data.master_error_count, int(age / 60))
-
-                                # The first time we are here, data is already 5 minutes old so waiting 5 times = 10 minutes to error.
-                                if data.error_count > 5:
-                                    return (0, "Outdated data.  Check local transmitter device")
-
-                                # else we will just fall through and continue to grab the data even though it will be the same as last
-
-                            # if not an age issue, then reset our consecutive error count back to zero.
-                            else:
-                                data.error_count = 0
-                                
-                            # Get current temp
-                            try:
-                                if data.config.use_Celsius:
-                                    data.temp_now = float(results['temp_c'])
-                                else:
-                                    data.temp_now = float(results['temp_f'])
-                                    
-                            # Key could be missing if battery on main station is dead
-                            # If so, continue without error.  Value will be displayed as "---"
-                            except KeyError:
-                                pass
-
-                            try:
-                                data.temp_high = float(results['davis_current_observation']['temp_day_high_f'])
-                                data.temp_low = float(results['davis_current_observation']['temp_day_low_f'])
-
-                                if data.config.use_Celsius:
-                                    data.temp_high = round((data.temp_high - 32) * 5 / 9, 1)
-                                    data.temp_low = round((data.temp_low - 32) * 5 / 9, 1)
-
-                            except KeyError:
-                                pass
-
-                            try:
-                                data.UV = float(results['davis_current_observation']['uv_index'])
-                                
-                            except KeyError:
-                                pass
-
-                            return (1, "Success")
-
-                        except KeyError as err:
-                            data.error_count += 1
-                            data.master_error_count += 1
-                            logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                                          '                     There was json error in the Davis data feed trying to read key: %s',
-                                          data.error_count, data.master_error_count, err)
-
-                            if data.error_count > 5:
-                                return (0, f"JSON key error: {err}")
-                            else:
-                                return (1, f"JSON key error: {err}")
-
-                    except json.decoder.JSONDecodeError as err:
-                        data.error_count += 1
-                        data.master_error_count += 1
-                        logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                                      '                     Invalid JSON file: %s',
-                                      data.error_count, data.master_error_count, err)
-
-                        if data.error_count > 5:
-                            return (0, f"JSON error: {err}")
-                        else:
-                            return (1, "Warning")
-
-            else:  # we got a V1 response code != 200
-                data.error_count += 1
-                data.master_error_count += 1
-                logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                              '                     HTTP Error: %s',
-                              data.error_count, data.master_error_count, response.status_code)
-
-                if data.error_count > 5:
-                    return (0, f"Network HTTP error: {response.status_code}")
-                else:
-                    return (1, "Warning")
-
-
-        except requests.exceptions.ConnectionError as err:
-
-            # Internet / network is lost
-            data.error_count += 1
-            data.master_error_count += 1
-            logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                          '                     Encountered a network connection error: %s',
-                          data.error_count, data.master_error_count, err)
-
-            if data.error_count > 5:
-                # In case dead wifi due to Pi, will try restarting it...
-                os.system("sudo ip link set wlan0 down")
-                time.sleep(2)
-                os.system("sudo ip link set wlan0 up")
-                
-                return (0, f"Network connection error.  Check WiFi Will retry...")
-            else:
-                return (1, "Warning")
-
-    else:  # V1 username was blank so use V2 interface
-        DAVIS_V2_API_BASE = "https://api.weatherlink.com/v2/stations?"
-        DAVIS_V2_API_URL = DAVIS_V2_API_BASE + "api-key=" + data.config.davis_key
+    try:
+        if v1:
+            observation, error = fetch_v1(data)
+        else:  # V1 username was blank so use V2 interface
+            observation, error = fetch_v2(data)
 
-        try:
-            response = requests.get(
-                headers={
-                    "X-Api-Secret": data.config.davis_secret
-                },
-                url=DAVIS_V2_API_URL,
-                verify=True,
-            )
-            response.close()
-            
-            if response.status_code == 200:
-                try:
-                    results = response.json()
-                    try:
-                        station_id = ''
-                        # If only one station on this WeatherLink account, use it regardless of name match
-                        if len(results) == 1:
-                            station_id = results['stations'][0]['station_id']
-                        else:  # Loop through all stations until we find the matching one
-                            for i in range(len(results)):
-                                if results['stations'][i]['station_name'] == data.config.davis_station_name:
-                                    # Grab the internal ID for that station to be used below
-                                    station_id = results['stations'][i]['station_id']
-                                    break
-
-                        if station_id:
-                            # we now have the ID of the V2 API station that we will be using so let's get
-                            # the current readings from all the sensors associated with that station.
-                            DAVIS_V2_API_BASE = "https://api.weatherlink.com/v2/current/"
-                            DAVIS_V2_API_URL = DAVIS_V2_API_BASE + str(station_id) + "?api-key=" + data.config.davis_key
-
-                            response = requests.get(
-                                headers={
-                                    "X-Api-Secret": data.config.davis_secret
-                                },
-                                url=DAVIS_V2_API_URL,
-                                verify=True,
-                            )
-                            response.close()
-
-                            if response.status_code == 200:
-                                results = response.json()
-
-                                temp = uv = timestamp = None  # Set a default in case no valid temp or UV readings returned.
-                                try:
-                                    i = 0
-                                    while True:  # loop through the various sensors found on this station
-                                        keys = []
-                                        if results['sensors'][i]['data_structure_type'] == 23:
-                                            # This is from a Davis 6313 Console
-                                            keys = ["temp", "uv_index", "ts"]
-                                        elif results['sensors'][i]['data_structure_type'] == 2:
-                                            # This is from a WeatherLinkIP device
-                                            keys = ["temp_out", "uv", "ts"]
-
-                                        if keys:
-                                            if temp is None:
-                                                try:
-                                                    temp = results['sensors'][i]['data'][0][keys[0]]
-                                                    if temp is not None:
-                                                        # Get the timestamp belonging to this sensor that we grabbed temperature from.
-                                                        timestamp = int(results['sensors'][i]['data'][0][keys[2]])
-                                                # Ignore error if temp sensor fails.  UV will still display.
-                                                # User should see sensor is missing in local console.
-                                                except KeyError:
-                                                    pass
-
-                                            if uv is None:
-                                                try:
-                                                    uv = results['sensors'][i]['data'][0][keys[1]]
-                                                    if uv is not None and timestamp is None:
-                                                        timestamp = int(results['sensors'][i]['data'][0][keys[2]])
-                                                # Ignore error if UV sensor fails.  Temperature will still display.
-                                                # User should see sensor is missing in local console.
-                                                except KeyError:
-                                                    pass
-
-                                        i += 1  # next sensor
-                                except IndexError:  # end of sensor loop
-                                    pass
-
-                                #  A zero-cost subscription provides 15 minute interval updates so anything over that means out of date.
-                                if timestamp is not None and ((datetime.now()-datetime.fromtimestamp(timestamp)).total_seconds() / 60) > 16:
-                                    data.error_count += 1
-                                    data.master_error_count += 1
-                                    logging.warning('Consecutive error count: %d.  Total error count: %d.\n'
-                                                    '                     Outdated data.  Data is %d minutes old.\n'
-                                                    '                     Check the local Davis Weatherlink transmitter device and its network\n'
-                                                    '                     connectivity.  There is nothing wrong with this display system!',
-                                                    data.error_count, data.master_error_count,
-                                                    round((datetime.now()-datetime.fromtimestamp(timestamp)).total_seconds() / 60))
-
-                                    # The first time we are here, data is already 15 minutes old so waiting 5 more times = 20 minutes to error.
-                                    if data.error_count > 5:
-                                        return (0, "Outdated data.  Check local transmitter device")
-
-                                # if not an age issue, then data is all good. Reset our consecutive error count back to zero.
-                                else:
-                                    data.error_count = 0
-
-                                # Even if age was too old, but under 5 consecutive times, we will just fall through
-                                #  and continue to grab the data even though it will be the same as last
-
-                                if temp is not None:
-                                    if data.config.use_Celsius:
-                                        data.temp_now = round((float(temp) - 32) / 9 * 5, 1)
-                                    else:
-                                        data.temp_now = float(temp)
-                                else:
-                                    data.temp_now = None
-
-                                if uv is not None:
-                                    data.UV = float(uv)
-                                else:
-                                    data.UV = None
-
-                                # Check to see if we have a new daily high or low
-                                # if previous hi/lo date is different than now or if we have a new high or new low,
-                                # then set our new hi/lo values and update the file
-                                if data.hi_low_date != datetime.now().timetuple().tm_yday:
-                                    #  we have a new day for highs and lows
-                                    data.hi_low_date = datetime.now().timetuple().tm_yday
-                                    data.temp_high = -999
-                                    data.temp_low = 999
-
-                                # new high or new low?
-                                if data.temp_now is not None:
-                                    if data.temp_now > data.temp_high or data.temp_now < data.temp_low:
-                                        if data.temp_now > data.temp_high:
-                                            data.temp_high = data.temp_now
-                                        if data.temp_now < data.temp_low:
-                                            data.temp_low = data.temp_now
-
-                                        filename = "high-lows.data"
-
-                                        with open(filename, "w") as file:
-                                            file.write(f"{data.hi_low_date} {data.temp_high} {data.temp_low}")
-
-                                return 1, "Success"
-
-                            else:
-                                # One possible error here is 404 {"code":"404","message":"Unable to find weather station settings"}
-                                # But don't know if others are possible
-                                data.error_count += 1
-                                data.master_error_count += 1
-
-                                results = response.json()
-                                logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                                              '                     HTTP Error: %s.  %s',
-                                              data.error_count, data.master_error_count, response.status_code, results['message'])
-
-                                if data.error_count > 5:
-                                    return (0, f"Network HTTP error: {response.status_code}")
-                                else:
-                                    return (1, "Warning")
-                                
-                        else:  # Could not find V2 station name
-                            data.error_count += 1
-                            data.master_error_count += 1
-                            logging.critical('Consecutive error count: %d.  Total error count: %d.\n'
-                                             '                     Could not find station named: %s\n'
-                                             '                     Verify credentials and check config.json file.',
-                                             data.error_count, data.master_error_count, data.config.davis_station_name)
-
-                            # This is likely a permanent error until fixed.  We will always return a failure regardless as to error count
-                            return (0, "Possible invalid Weatherlink station name")
-
-                    except KeyError as err:
-                        data.error_count += 1
-                        data.master_error_count += 1
-                        logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                                      '                     There was json error in the Davis data feed trying to read key: %s',
-                                      data.error_count, data.master_error_count, err)
-
-                        if data.error_count > 5:
-                            return (0, f"JSON key error: {err}")
-                        else:
-                            return (1, f"JSON key error: {err}")
-
-                except json.decoder.JSONDecodeError as err:
-                    data.error_count += 1
-                    data.master_error_count += 1
-                    logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                                  '                     Invalid JSON file: %s',
-                                  data.error_count, data.master_error_count, err)
-
-                    if data.error_count > 5:
-                        return (0, f"JSON error: {err}")
-                    else:
-                        return (1, "Warning")
-
-            else:  # Was not a 200 response code for V2.  Possible 401 code?
-                # Bad key:  401 {"message":"Invalid authentication credentials"}
-                # Bad secret: 401 {"code":"401","message":"Invalid API Key/API Secret."}
-                # Could be others?
-                data.error_count += 1
-                data.master_error_count += 1
-                if response.status_code == 401:
-                    logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                                  '                     HTTP Error: %s\n'
-                                  '                     Possible invalid Davis Weatherlink API V2 key or secret.\n'
-                                  '                     Verify credentials and check config.json file.',
-                                  data.error_count, data.master_error_count, response.status_code)
-                else:
-                    logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                                  '                     HTTP Error: %s',
-                                  data.error_count, data.master_error_count, response.status_code)
-
-                if data.error_count > 5:
-                    if response.status_code == 401:
-                        return (0, f"Network HTTP error: {response.status_code}. Bad API key or secret?")
-                    else:
-                        return (0, f"Network HTTP error: {response.status_code}")
-                else:
-                    return (1, "Warning")
-
-        except requests.exceptions.ConnectionError as err:
-
-            # Internet / network is lost
-            data.error_count += 1
-            data.master_error_count += 1
-            logging.error('Consecutive error count: %d.  Total error count: %d.\n'
-                          '                     Encountered a network connection error: %s',
-                          data.error_count, data.master_error_count, err)
-
-            if data.error_count > 5:
-                # In case dead wifi due to Pi, will try restarting it...
-                os.system("sudo ip link set wlan0 down")
-                time.sleep(2)
-                os.system("sudo ip link set wlan0 up")
-                
-                return (0, f"Network connection error.  Check WiFi Will retry...")
-            else:
-                return (1, "Warning")
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+        # Internet / network is lost or the server stopped answering
+        count_error(data, logging.ERROR, 'Encountered a network connection error: %s', err)
 
-def get_colour(data, temp):
+        # The watchdog decides, in the background, whether to probe, restart the Wi-Fi or reboot
+        data.watchdog.report_failure()
 
-    really_hot = data.config.really_hot
-    really_cold = data.config.really_cold
-    
-    # cap out at the max temps allowed
-    if temp > really_hot:
-        temp = really_hot
-    elif temp < really_cold:
-        temp = really_cold
-
-    # Anything below freezing will be blue or purple
-    # If using that other scale, must convert to Celsius to make this work
-    if not data.config.use_Celsius:
-        temp = (temp - 32) * 5 / 9
-        really_hot = (really_hot - 32) * 5 / 9
-        really_cold = (really_cold - 32) * 5 / 9
-
-    if temp >= 0:
-        full_range = really_hot
-        z = (really_hot - temp) / full_range * 210  # 0 - 210
-    else:
-        full_range = -really_cold
-        z = (-temp) / full_range * 90 + 210  # 210 - 300
+        return error_result(data, "Network connection error.  Check WiFi Will retry...")
 
-    # Convert degrees (of a circle) to the RYB colour wheel
-    # RYB colour wheel provides best rainbow of colours
-    r, yellow, b = colorsys.hsv_to_rgb(z / 360.0, 1.0, 1.0)
+    except KeyError as err:
+        count_error(data, logging.ERROR, 'There was json error in the Davis data feed trying to read key: %s', err)
+        return error_result(data, f"JSON key error: {err}", (1, f"JSON key error: {err}"))
 
-    R, Y, B = int(255 * r), int(255 * yellow), int(255 * b)
+    except json.decoder.JSONDecodeError as err:
+        count_error(data, logging.ERROR, 'Invalid JSON file: %s', err)
+        return error_result(data, f"JSON error: {err}")
 
-    # Convert RYB to RGB
-    R, G, B = ryb2rgb.ryb2rgb(R, Y, B)
+    if error:
+        return error
 
-    return (R, G, B)
+    return use_observation(data, observation, 'v1' if v1 else 'v2')
 
 
-def get_colour_UV(UV):
-    # This will return Environment Canada UV Index colours
+# Checks the age of an observation and stores it for display.  source is 'local', 'v1' or 'v2'.
+def use_observation(data, observation, source):
+    # The V1 device uploads every minute and a WeatherLink Live answers with readings seconds old.
+    # A zero-cost V2 subscription provides 15 minute interval updates so anything over that means out of date.
+    stale_after = 16 * 60 if source == 'v2' else 5 * 60
+    age = time.time() - observation.observed_at if observation.observed_at is not None else 0
+    if age > stale_after:
+        count_error(data, logging.WARNING,
+                    'Outdated data.  Data is %d minutes old.\n'
+                    '                     Check the local Davis Weatherlink transmitter device and its network\n'
+                    '                     connectivity.  There is nothing wrong with this display system!',
+                    int(age / 60))
 
-    if UV < 3.0:  # low - green
-        return (79, 179, 0)
-    elif UV < 6.0:  # moderate - yellow
-        return (253, 205, 0)
-    elif UV < 8.0:  # high - orange
-        return (255, 102, 0)
-    elif UV < 11.0:  # very high - red
-        return (255, 0, 0)
-    else:  # extreme - purple
-        return (206, 49, 254)
+        # The first time we are here, the data is already stale so this waits 5 more times before showing an error.
+        if data.error_count > 5:
+            return (0, "Outdated data.  Check local transmitter device")
 
+        # else we will just fall through and continue to grab the data even though it will be the same as last
 
-def get_sunrise_sunset(data, horizon):
-    my_location = ephem.Observer()
+    # if not an age issue, then reset our consecutive error count back to zero.
+    else:
+        data.error_count = 0
+
+    data.observed_at = observation.observed_at
+
+    # A missing key could mean the battery on the main station is dead.  If so, continue without
+    # error.  The value will be displayed as "---".
+    data.temp_now = display_temp(data, observation.temp)
+    data.UV = observation.uv
+
+    stage = time.perf_counter()
+    if observation.observed_at is not None:
+        data.history.append(observation.observed_at, observation.temp, observation.uv,
+                            data.light if data.light_sensor is not None else None, data.matrix.brightness)
+        data.recent.append(observation.observed_at, data.temp_now, data.UV)
+
+    if source == 'v1':
+        # The V1 API maintains its own daily high and low
+        data.temp_high = display_temp(data, observation.temp_high)
+        data.temp_low = display_temp(data, observation.temp_low)
+        if data.temp_high is None:
+            data.temp_high = -999
+        if data.temp_low is None:
+            data.temp_low = 999
+    else:
+        update_high_low(data)
+    data.spans.mark('fetch.history', stage)
 
-    my_location.lat = data.config.my_location_lat
-    my_location.lon = data.config.my_location_lon
-    my_location.horizon = horizon
+    return (1, "Success")
 
-    sun = ephem.Sun()
 
-    current = ephem.now()
-    
+# Reads the WeatherLink Live.  Returns (observation, None), (None, None) to fall back to the Davis
+# server, or (None, the (success, message) result that get_temp should return) if there is no Davis account.
+def fetch_local(data):
+    data.source = 'local'
+    stage = time.perf_counter()
     try:
-        sunrise = my_location.next_rising(sun)
-        sunset = my_location.next_setting(sun)
+        observation = data.local.fetch(data.http, data.scheduler.time_left())
+        data.spans.mark('fetch.local', stage)  # HTTP and parsing.  The device answers in milliseconds.
+    except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as err:
+        data.local.failed(err, fallback=data.config.use_cloud)
+        if data.config.use_cloud:
+            return None, None
+
+        count_error(data, logging.ERROR, 'Could not read the WeatherLink Live at %s: %s', data.local.host, err)
+        if isinstance(err, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            data.watchdog.report_failure()
+            return None, error_result(data, "Network connection error.  Check WiFi Will retry...")
+        return None, error_result(data, f"WeatherLink Live error: {err}")
+
+    if not data.config.use_cloud:
+        data.watchdog.report_success()
+    return observation, None
+
+
+# Fetches the V1 observation.  Returns (observation, None), or (None, the (success, message) result
+# that get_temp should return) on failure.
+def fetch_v1(data):
+    DAVIS_V1_API_BASE = data.config.weatherlink_url + "/v1/NoaaExt.json?user="
+    DAVIS_V1_API_URL = DAVIS_V1_API_BASE + data.config.davis_user + "&pass=" + data.config.davis_password
+
+    stage = time.perf_counter()
+    response = data.http.get(DAVIS_V1_API_URL, 'v1_noaa', time_left=data.scheduler.time_left())
+    stage = data.spans.mark('fetch.http', stage)
+    data.watchdog.report_success()
+
+    # Force close to free resources / stop slow memory leak.  Returns the connection to the pool.
+    response.close()
+
+    if response.status_code != 200:
+        count_error(data, logging.ERROR, 'HTTP Error: %s', response.status_code)
+        return None, error_result(data, f"Network HTTP error: {response.status_code}")
+
+    if response.text == 'Invalid Request!':
+        count_error(data, logging.CRITICAL,
+                    'Possible invalid Davis WeatherlinkIP username or password.\n'
+                    '                     Verify credentials and check config.json file.')
+
+        # This is likely a permanent error until fixed.  We will always return a failure regardless as to error count
+        return None, (0, "Possible invalid Weatherlink user name or password")
+
+    observation = parse_v1(loads(response.content))
+    data.spans.mark('fetch.parse', stage)
+    return observation, None
+
+
+# Fetches the V2 observation.  Returns (observation, None), or (None, the (success, message) result
+# that get_temp should return) on failure.
+def fetch_v2(data):
+    # The station ID never changes so it is only looked up when we don't already have it
+    if data.station_id is None:
+        error = get_station_id(data)
+        if error:
+            return None, error
+
+    # we now have the ID of the V2 API station that we will be using so let's get
+    # the current readings from all the sensors associated with that station.
+    DAVIS_V2_API_BASE = data.config.weatherlink_url + "/v2/current/"
+    DAVIS_V2_API_URL = DAVIS_V2_API_BASE + str(data.station_id) + "?api-key=" + data.config.davis_key
+
+    stage = time.perf_counter()
+    response = data.http.get(DAVIS_V2_API_URL, 'v2_current',
+                             headers={"X-Api-Secret": data.config.davis_secret},
+                             time_left=data.scheduler.time_left())
+    stage = data.spans.mark('fetch.http', stage)
+    response.close()
+    data.watchdog.report_success()
+
+    if response.status_code != 200:
+        # One possible error here is 404 {"code":"404","message":"Unable to find weather station settings"}
+        # But don't know if others are possible
+        # The cached station ID is no longer valid (station removed or re-registered).
+        # Look it up again on the next pass.
+        if response.status_code == 404:
+            forget_station_id(data)
+
+        message = loads(response.content)['message']
+        count_error(data, logging.ERROR, 'HTTP Error: %s.  %s', response.status_code, message)
+        return None, error_result(data, f"Network HTTP error: {response.status_code}")
+
+    observation = parse_v2(loads(response.content))
+    data.spans.mark('fetch.parse', stage)
+    return observation, None
+
+
+# Readings are kept here, in Fahrenheit
+HISTORY_FILE = "history.data"
+
+
+# The V2 API and a WeatherLink Live only give the current temperature so the daily high and low
+# come from the history.
+def update_high_low(data):
+    today = data.history.day_range(time.time())
+    if today is None:
+        # No readings yet today
+        data.temp_high = -999
+        data.temp_low = 999
+    else:
+        data.temp_low = display_temp(data, today[0])
+        data.temp_high = display_temp(data, today[1])
 
-        # if the next sunrise and/or sunset is now tomorrow, then we need to get the previous one (= today's)
-        # so that this function always returns today's sunrise and sunset regardless as to the current time of day
-        if ephem.localtime(sunrise).day != ephem.localtime(current).day:
-            sunrise = my_location.previous_rising(sun)
 
-        if ephem.localtime(sunset).day != ephem.localtime(current).day:
-            sunset = my_location.previous_setting(sun)
+# Older versions kept only today's high and low, in the display units, in this file
+HIGH_LOW_FILE = "high-lows.data"
 
-        return sunrise, sunset, current
-    
-    # And just in case you are in a very high +/- latitude
-    except ephem.NeverUpError:
-        return current +1, current -1 , current
-    
-    except ephem.AlwaysUpError:
-        return current -1, current + 1, current
+
+# Carries today's high and low over from an older version into the history's daily index.  Read at
+# every start on the day of the upgrade, so a restart later that day keeps them.  Ignored after that.
+def import_high_lows(data):
+    if not os.path.isfile(HIGH_LOW_FILE):
+        return
+
+    try:
+        with open(HIGH_LOW_FILE, "r") as file:
+            day_of_year, high, low = map(float, file.read().split())
+        written = datetime.fromtimestamp(os.path.getmtime(HIGH_LOW_FILE))
+    except (OSError, ValueError):
+        logging.warning('Ignoring unreadable high / low file: %s', HIGH_LOW_FILE)
+        return
+
+    now = datetime.now()
+    # -999 / 999 means no reading had come in that day
+    if written.date() == now.date() and day_of_year == now.timetuple().tm_yday and low <= high:
+        if data.config.use_Celsius:
+            low, high = low * 9 / 5 + 32, high * 9 / 5 + 32
+        data.history.merge_day(time.time(), low, high)
+        logging.info('Carried over today\'s high and low from %s', HIGH_LOW_FILE)
+
+
+def compact_history(data):
+    # The scheduler runs this once a day so the history file of a display that is never restarted
+    # still only holds the retention period
+    data.history.compact()
+
+
+# Resolve the V2 station ID from the configured station name.  Returns None on success or the
+# (success, message) result that get_temp should return on failure.
+def get_station_id(data):
+    DAVIS_V2_API_BASE = data.config.weatherlink_url + "/v2/stations?"
+    DAVIS_V2_API_URL = DAVIS_V2_API_BASE + "api-key=" + data.config.davis_key
+
+    response = data.http.get(DAVIS_V2_API_URL, 'v2_stations',
+                             headers={"X-Api-Secret": data.config.davis_secret},
+                             time_left=data.scheduler.time_left())
+    response.close()
+    data.watchdog.report_success()
+
+    if response.status_code == 200:
+        # A JSON or key error is handled by get_temp
+        station_id = find_station(loads(response.content), data.config.davis_station_name)
+
+        if station_id:
+            save_station_id(data, station_id)
+            return None
+
+        # Could not find V2 station name
+        count_error(data, logging.CRITICAL,
+                    'Could not find station named: %s\n'
+                    '                     Verify credentials and check config.json file.',
+                    data.config.davis_station_name)
+
+        # This is likely a permanent error until fixed.  We will always return a failure regardless as to error count
+        return (0, "Possible invalid Weatherlink station name")
+
+    # Was not a 200 response code for V2.  Possible 401 code?
+    # Bad key:  401 {"message":"Invalid authentication credentials"}
+    # Bad secret: 401 {"code":"401","message":"Invalid API Key/API Secret."}
+    # Could be others?
+    if response.status_code == 401:
+        count_error(data, logging.ERROR,
+                    'HTTP Error: %s\n'
+                    '                     Possible invalid Davis Weatherlink API V2 key or secret.\n'
+                    '                     Verify credentials and check config.json file.',
+                    response.status_code)
+        return error_result(data, f"Network HTTP error: {response.status_code}. Bad API key or secret?")
+
+    count_error(data, logging.ERROR, 'HTTP Error: %s', response.status_code)
+    return error_result(data, f"Network HTTP error: {response.status_code}")
+
+
+# The station ID is cached on disk along with the station name and a hash of the API key it was
+# resolved with.  If either changes in config.json, the cached ID is ignored and looked up again.
+STATION_ID_FILE = "station-id.data"
+
+
+def station_id_owner(config):
+    return config.davis_station_name, hashlib.sha256(config.davis_key.encode()).hexdigest()
+
+
+def load_station_id(data):
+    data.station_id = None
+
+    if os.path.isfile(STATION_ID_FILE):
+        try:
+            with open(STATION_ID_FILE, "r") as file:
+                cached = json.load(file)
+            if (cached["station_name"], cached["api_key_hash"]) == station_id_owner(data.config):
+                data.station_id = cached["station_id"]
+        except (ValueError, KeyError, TypeError):
+            logging.warning('Ignoring unreadable station ID cache: %s', STATION_ID_FILE)
+
+
+def save_station_id(data, station_id):
+    data.station_id = station_id
+
+    station_name, api_key_hash = station_id_owner(data.config)
+    with open(STATION_ID_FILE, "w") as file:
+        json.dump({"station_name": station_name, "api_key_hash": api_key_hash, "station_id": station_id}, file)
+
+
+def forget_station_id(data):
+    data.station_id = None
+
+    if os.path.isfile(STATION_ID_FILE):
+        os.remove(STATION_ID_FILE)
+
+
+def get_colour_table(data):
+
+    # Colours come from a table built once from the config.  Rebuilt if those settings ever change.
+    key = (data.config.really_hot, data.config.really_cold, data.config.use_Celsius)
+    if data.colour_table is None or data.colour_table.key != key:
+        data.colour_table = ColourTable(*key)
+
+    return data.colour_table
+
+
+def get_colour(data, temp):
+    return get_colour_table(data).lookup(temp)
+
+
+def get_colour_UV(UV):
+    # This will return Environment Canada UV Index colours
+    return uv_colour(UV)
+
+
+def get_sunrise_sunset(data, horizon):
+    # Today's sunrise and sunset only change once a day so they are solved once per day
+    # (or read from the optional yearly table) and cached.
+    return data.sun_times.get(horizon)
 
 
 def estimate_brightness(data):
@@ -764,44 +798,88 @@ def is_sun_above(data):
     # Is the sun above the horizon?
     # Used to determine when we start showing the UV value.  No point when sun not above our horizon.
 
+    stage = time.perf_counter()
     sunrise, sunset, current = get_sunrise_sunset(data, data.config.my_location_horizon)
+    data.spans.mark('weather.sun', stage)
     return sunrise < current < sunset
 
 
-def set_brightness(data):
+# Brightness only moves to a new target if it differs by at least this many percent, and then
+# only this many percent per second so the change is smooth rather than a jump.
+BRIGHTNESS_HYSTERESIS = 3
+BRIGHTNESS_STEP = 2
 
-    if data.config.use_sensor and data.lux_sensor_available:
-        try:
-            sensor = adafruit_veml7700.VEML7700(data.i2c)
 
-            data.light=sensor.light
+def set_brightness(data):
+    # Works out the brightness the display should be at.  ramp_brightness() moves it there.
+    stage = time.perf_counter()
 
-            # map sensor brightness levels to matrix brightness percentage equivalent
-            light_in =   [2000, 500, 200, 50,  0]
-            percent_out = [100,  60,  40, 30, 20]
+    # Smoothed reading from the sensor's own sampling.  Read once: the sensor can drop out at any time.
+    light = data.light_sensor.light if data.light_sensor is not None else None
 
-            for i, level in enumerate(light_in):
-                if data.light >= level:
-                    break
+    if light is not None:
+        data.light = light
 
-            if i == 0:
-                b = percent_out[0]
-            else:
-                b = int((data.light - light_in[i]) / (light_in[i-1] - light_in[i]) *
-                        (percent_out[i-1] - percent_out[i]) + percent_out[i])
-        except:
-            logging.warning('Light sensor lost.  Falling back to software mode.')
-            data.lux_sensor_available = False 
+        # map sensor brightness levels to matrix brightness percentage equivalent
+        light_in =   [2000, 500, 200, 50,  0]
+        percent_out = [100,  60,  40, 30, 20]
 
+        for i, level in enumerate(light_in):
+            if data.light >= level:
+                break
 
-    if not data.config.use_sensor or not data.lux_sensor_available: # no sensor - estimate light
+        if i == 0:
+            b = percent_out[0]
+        else:
+            b = int((data.light - light_in[i]) / (light_in[i-1] - light_in[i]) *
+                    (percent_out[i-1] - percent_out[i]) + percent_out[i])
+
+    else:  # no sensor (or it is not answering right now) - estimate light
         data.light = estimate_brightness(data)
         b = int((data.config.max_brightness_percent - data.config.min_brightness_percent) *
                 data.light + data.config.min_brightness_percent)
         
         data.light *= 100  # For display purposes only
+    data.spans.mark('brightness.sensor' if light is not None else 'brightness.sun', stage)
+
+    if data.brightness_override is not None:
+        data.target_brightness = data.brightness_override
+    elif data.target_brightness is None or abs(b - data.target_brightness) >= BRIGHTNESS_HYSTERESIS:
+        data.target_brightness = b
+
+
+def sample_light(data):
+    # The scheduler runs this every couple of seconds.  Reads the sensor over I2C.
+    stage = time.perf_counter()
+    data.light_sensor.sample()
+    data.spans.mark('light_sensor.i2c', stage)
+
+
+def ramp_brightness(data):
+    # The scheduler runs this every second to step the matrix brightness towards its target
+    set_brightness(data)
+
+    current = data.matrix.brightness
+    if current == data.target_brightness:
+        return
+
+    step = max(-BRIGHTNESS_STEP, min(BRIGHTNESS_STEP, data.target_brightness - current))
+    data.matrix.brightness = current + step
 
-    data.matrix.brightness = b
+    # The new brightness only applies to what is drawn from now on
+    redraw(data)
+
+
+def redraw(data):
+    # Draw whatever is currently showing again.  After hours, the blinking cursor redraws itself every second.
+    if data.after_hours:
+        return
+
+    success, msg = data.last_result
+    if success:
+        refresh_display(data)
+    else:
+        error_display(data, msg)
 
 
 # When after hours, clear the display but show a blinking cursor so we know that the display is still active.
@@ -812,6 +890,7 @@ class Blink_pixel:
         self.on = False
         
         self.data.canvas.Clear()
+        self.data.frame_state.invalidate()
 
     def blink(self):
 
@@ -821,8 +900,8 @@ class Blink_pixel:
         else:
             x = 0
 
-        # See if we are still in the non-operational hours and if so, display the cursor and fire this to run again in one second.
-        # Otherwise, this method just ends and does not retrigger until the main loop fires it up at the start of the next end-of-day.
+        # See if we are still in the non-operational hours and if so, display the cursor.
+        # The scheduler runs this every second until the main loop cancels it at the start of opening hours.
         if self.data.after_hours == True:
             # closed hours
 
@@ -834,85 +913,124 @@ class Blink_pixel:
             graphics.DrawLine(self.data.canvas, w - 2, h - 1, w - 1, h - 1, graphics.Color(x, x, x))
 
             self.data.matrix.SwapOnVSync(self.data.canvas)
-
-            # Fire this method again in one second to toggle the cursor
-            self.data.timer_blink = threading.Timer(1, self.blink)
-            self.data.timer_blink.start()
+            self.data.frame_state.invalidate()
 
 
 def enable_UV(data):
+    # The weather may have been replaced by an error or the after hours cursor since this was scheduled
+    if data.after_hours or not data.last_result[0]:
+        return
     data.show_hi_lo_temp = False
     refresh_display(data)
 
 
+def enable_trend(data):
+    # The weather may have been replaced by an error or the after hours cursor since this was scheduled
+    if data.after_hours or not data.last_result[0]:
+        return
+    data.show_trend = True
+    refresh_display(data)
+
+
+# Trend pane layout: at most this many columns (30 minutes each), under a title, in this many rows
+# from this one down.  Not shown if the current temperature leaves too little room.
+TREND_COLUMNS = 48
+TREND_MIN_COLUMNS = 12
+TREND_TOP = 8
+TREND_ROWS = 24
+
+
 def refresh_display(data):
+    start = time.perf_counter()
 
     if data.temp_now is None:
         sTemp = ' ---'
-        r = g = b = 255
+        sDecimal = ''
+        temp_rgb = (255, 255, 255)
     else:
         if data.temp_now >= 100.0:
-            # Can't fit 4-digit temps on this display so grab 3.  Will add decimal later.
+            # Can't fit 4-digit temps on this display so grab 3.  The decimal is added in a smaller font.
             sTemp = '%d' % data.temp_now
+            sDecimal = ('%.1f' % data.temp_now)[3:5]
         else:
             sTemp = '%.1f' % data.temp_now
+            sDecimal = ''
             
-        r, g, b = get_colour(data, data.temp_now)
-
-    temp_color = graphics.Color(r, g, b)
+        temp_rgb = get_colour(data, data.temp_now)
 
     if data.temp_high == -999:
         sHi = '---'
-        r = g = b = 255
+        hi_rgb = (255, 255, 255)
     else:
         sHi = '%.1f' % data.temp_high
-        r, g, b = get_colour(data, data.temp_high)
-
-    temp_high_color = graphics.Color(r, g, b)
+        hi_rgb = get_colour(data, data.temp_high)
 
     if data.temp_low == 999:
         sLo = '---'
-        r = g = b = 255
+        lo_rgb = (255, 255, 255)
     else:
         sLo = '%.1f' % data.temp_low
-        r, g, b = get_colour(data, data.temp_low)
-
-    temp_low_color = graphics.Color(r, g, b)
+        lo_rgb = get_colour(data, data.temp_low)
 
     if data.UV is None:
         sUV = '---'
-        r = g = b = 255
+        UV_rgb = (255, 255, 255)
     else:
         sUV = '%.1f' % data.UV
-        r, g, b = get_colour_UV(data.UV)
-    
-    UV_color = graphics.Color(r, g, b)
+        UV_rgb = get_colour_UV(data.UV)
 
     sHiLoTitle = 'High-Low'
     sUVTitle = 'UV'
+    sTrendTitle = '24h'
 
-    # Determine pixel length required for each string / font.  Needs to draw on a canvas to determine - we will clear shortly
-    lenHiLoTitle = graphics.DrawText(data.canvas, data.font_small, 0, 0, data.title_color, sHiLoTitle)
-    lenUVTitle = graphics.DrawText(data.canvas, data.font_med, 0, 0, data.title_color, sUVTitle)
-    lenTemp = graphics.DrawText(data.canvas, data.font_large, 0, 0, data.title_color, sTemp)
-    lenHi = graphics.DrawText(data.canvas, data.font_med, 0, 0, data.title_color, sHi)
-    lenLo = graphics.DrawText(data.canvas, data.font_med, 0, 0, data.title_color, sLo)
-    lenUV = graphics.DrawText(data.canvas, data.font_med, 0, 0, data.title_color, sUV)
-    lenMaxHiLo = max(lenHi, lenLo)
+    # Determine pixel length required for each string / font.  Worked out from the glyph widths (and cached)
+    # rather than drawing each string on the canvas just to measure it.
+    lenTemp = data.text_extents.width(data.font_large, sTemp)
     panel_width = data.canvas.width
 
-    data.canvas.Clear()
-    graphics.DrawText(data.canvas, data.font_large, 0, 29, temp_color, sTemp)
-
-    # If >= 100 (Fahrenheit), it won't all fit so put decimal portion in a smaller font
-    if data.temp_now and data.temp_now >= 100.0:
-        graphics.DrawText(data.canvas, data.font_med, lenTemp-5, 29, temp_color, ('%.1f' % data.temp_now)[3:5])
+    # First column right of the current temperature
+    left_end = lenTemp
+    if sDecimal:
+        left_end = lenTemp - 5 + data.text_extents.width(data.font_med, sDecimal)
 
     # Knowing the lengths in pixels, determine the starting pixel positions for each string
     # The display is split into two halves; current temperature always on the left and hi/lo Temps / UV on the right
     end_pos = panel_width
 
-    if data.show_hi_lo_temp:
+    # The trend pane gets whatever room the current temperature leaves, up to TREND_COLUMNS
+    trend_columns = min(TREND_COLUMNS, panel_width - left_end - 1)
+    show_trend = data.show_trend and trend_columns >= TREND_MIN_COLUMNS
+
+    if show_trend:
+        # Trend of whichever of temperature or UV was showing.  Each column is coloured by its own average.
+        trend_x = panel_width - trend_columns
+        now = time.time()
+        ts, temps, uvs = data.recent.window(now)
+        if data.show_hi_lo_temp:
+            line = sparkline(ts, temps, now, trend_columns, TREND_ROWS)
+            if line is not None:
+                trend_rgb = get_colour_table(data).lookup_array(line[0])
+        else:
+            line = sparkline(ts, uvs, now, trend_columns, TREND_ROWS)
+            if line is not None:
+                trend_rgb = uv_colour_array(line[0])
+
+        lenTrendTitle = data.text_extents.width(data.font_small, sTrendTitle)
+        TrendTitle_pos = trend_x + (trend_columns - lenTrendTitle) // 2
+        if line is None:
+            # Nothing in the last 24 hours
+            lenNoTrend = data.text_extents.width(data.font_med, '---')
+            NoTrend_pos = trend_x + (trend_columns - lenNoTrend) // 2
+            right = ('trend', data.show_hi_lo_temp, None)
+        else:
+            right = ('trend', data.show_hi_lo_temp, line[1].tobytes(), trend_rgb.tobytes())
+        right_start = min(trend_x, TrendTitle_pos)
+
+    elif data.show_hi_lo_temp:
+        lenHiLoTitle = data.text_extents.width(data.font_small, sHiLoTitle)
+        lenHi = data.text_extents.width(data.font_med, sHi)
+        lenLo = data.text_extents.width(data.font_med, sLo)
+        lenMaxHiLo = max(lenHi, lenLo)
 
         if lenHiLoTitle > lenMaxHiLo and int((lenHiLoTitle - lenMaxHiLo) / 2) + end_pos > panel_width:
             end_pos -= int((lenHiLoTitle - lenMaxHiLo) / 2) + end_pos - panel_width
@@ -922,11 +1040,12 @@ def refresh_display(data):
         Hi_pos = end_pos - lenHi
         Lo_pos = end_pos - lenLo
 
-        graphics.DrawText(data.canvas, data.font_small, HiLoTitle_pos, 6, data.title_color, sHiLoTitle)
-        graphics.DrawText(data.canvas, data.font_med, Hi_pos, 19, temp_high_color, sHi)
-        graphics.DrawText(data.canvas, data.font_med, Lo_pos, 31, temp_low_color, sLo)
+        right = ('hi_lo', sHi, hi_rgb, sLo, lo_rgb)
+        right_start = int(min(HiLoTitle_pos, Hi_pos, Lo_pos))
 
     else:  # showing UV
+        lenUVTitle = data.text_extents.width(data.font_med, sUVTitle)
+        lenUV = data.text_extents.width(data.font_med, sUV)
 
         # This "if" should never occur if the title stays very short such as "UV"
         if lenUVTitle > lenUV and int((lenUVTitle - lenUV) / 2) + end_pos > panel_width:
@@ -936,10 +1055,55 @@ def refresh_display(data):
         UVTitle_pos = end_pos - (lenUV - lenUVTitle) / 2 - lenUVTitle
         UV_pos = end_pos - lenUV
 
-        graphics.DrawText(data.canvas, data.font_med, UVTitle_pos, 14, data.title_color, sUVTitle)
-        graphics.DrawText(data.canvas, data.font_med, UV_pos, 28, UV_color, sUV)
+        right = ('UV', sUV, UV_rgb)
+        right_start = int(min(UVTitle_pos, UV_pos))
+
+    # Most minutes nothing has changed (the free tier only has new data every 15 minutes).  Then there
+    # is nothing to draw or swap.  If only the right pane changed, just that part is drawn again.
+    action = data.frame_state.update(('weather', data.matrix.brightness), (sTemp, sDecimal, temp_rgb), right,
+                                     left_end, right_start)
+    stage = data.spans.mark('refresh.layout', start)
+    if action == frame_diff.SKIP:
+        return
+
+    if action == frame_diff.FULL:
+        x = 0
+        data.composer.clear()
+        data.composer.draw_text(data.font_large, 0, 29, temp_rgb, sTemp)
+
+        # If >= 100 (Fahrenheit), it won't all fit so put decimal portion in a smaller font
+        if sDecimal:
+            data.composer.draw_text(data.font_med, lenTemp-5, 29, temp_rgb, sDecimal)
 
+    else:  # right pane only
+        x = data.frame_state.clear_from
+        data.composer.clear(x)
+
+    title_rgb = (data.title_color.red, data.title_color.green, data.title_color.blue)
+
+    if show_trend:
+        data.composer.draw_text(data.font_small, TrendTitle_pos, 6, title_rgb, sTrendTitle)
+        if line is None:
+            data.composer.draw_text(data.font_med, NoTrend_pos, 28, (255, 255, 255), '---')
+        else:
+            data.composer.draw_columns(trend_x, TREND_TOP, TREND_ROWS, line[1], trend_rgb)
+
+    elif data.show_hi_lo_temp:
+        data.composer.draw_text(data.font_small, HiLoTitle_pos, 6, title_rgb, sHiLoTitle)
+        data.composer.draw_text(data.font_med, Hi_pos, 19, hi_rgb, sHi)
+        data.composer.draw_text(data.font_med, Lo_pos, 31, lo_rgb, sLo)
+
+    else:  # showing UV
+        data.composer.draw_text(data.font_med, UVTitle_pos, 14, title_rgb, sUVTitle)
+        data.composer.draw_text(data.font_med, UV_pos, 28, UV_rgb, sUV)
+
+    image = data.composer.image(x)
+    stage = data.spans.mark('refresh.draw', stage)
+
+    # Whole frame (or the changed right hand part of it) in one call
+    data.canvas.SetImage(image, x, 0)
     data.matrix.SwapOnVSync(data.canvas)
+    data.render_time.observe(data.spans.mark('refresh.swap', stage) - start)
 
 
 def error_display(data, text):
@@ -953,18 +1117,29 @@ def error_display(data, text):
     # "Network connection error.  Check WiFi Will retry..."
     # "Network HTTP error: ###"
     
+    # Same message at the same brightness is already showing
+    if data.frame_state.update(('message', data.matrix.brightness), text) == frame_diff.SKIP:
+        return
+    stage = time.perf_counter()
+
     line = textwrap.wrap(text, 18)
 
-    data.canvas.Clear()
+    data.composer.clear()
 
+    title_rgb = (data.title_color.red, data.title_color.green, data.title_color.blue)
     for i in range(len(line)):
-        graphics.DrawText(data.canvas, data.font_msg, 0, i * 11 + 9, data.title_color, line[i])
+        data.composer.draw_text(data.font_msg, 0, i * 11 + 9, title_rgb, line[i])
 
+    image = data.composer.image()
+    stage = data.spans.mark('message.draw', stage)
+
+    data.canvas.SetImage(image, 0, 0)
     data.matrix.SwapOnVSync(data.canvas)
+    data.spans.mark('message.swap', stage)
 
 # testing
-# press 0-9 to set 100%, 10 - 90% brightness
-# press space to have above confirmed, along with current light setting.
+# press 0-9 to set 100%, 10 - 90% brightness, 'a' to go back to automatic.  The status that used to be shown with the space bar
+# is now on the metrics endpoint.
 def on_key_press(data, key):
     
     try:
@@ -972,120 +1147,247 @@ def on_key_press(data, key):
             i = int(key.char) * 10
             if (i == 0):
                 i = 100
-            data.matrix.brightness = i
-            refresh_display(data)
+            # ramp_brightness() takes the display there and keeps it there
+            data.brightness_override = data.target_brightness = i
 
-    except AttributeError:
+        elif key.char == 'a':
+            data.brightness_override = None  # back to the sensor or time of day
 
-        if key.space:
-            # Create a string of status info
-            
-            # Up:### Mem Use:##%
-            # CPU T:##.# Err:###
-            # Lt:### Bright:###%
-            message="Up:%3d Mem Use:%2d%%" % ((datetime.now()-data.start_time).days, psutil.virtual_memory().percent)
-            message += " CPU T:%4.1f Err:%3d" % (CPUTemperature().temperature, data.master_error_count )
-            message += " Lt:"
-            if data.light > 999:
-                message += "%2dk" % int(data.light/1000)
-            else:
-                message += "%3d" % data.light
-            message += " Bright:%3d%%" % data.matrix.brightness
-            
-            error_display(data, message)
+    except AttributeError:
+        pass  # a key without a character
 
     
-def main_loop(data):
-    # this loop is executed every 60 seconds
-
-    # go get and set the matrix brightness
-    set_brightness(data)
-
+def is_after_hours(data):
     # see if we are in the non-operational hours
     current = datetime.strptime(datetime.now().strftime("%H:%M"), "%H:%M").time()
 
-    if not data.config.op_hours_24_hours_per_day and not (data.config.open_at <= current < data.config.closed_at):
-        # closed hours
-        
-        # Even if it is after hours, if we are using the V2 API, we must continuously
-        # read the temperature so that the daily highs and lows can be maintained
-        # by this program even though we are not displaying anything during this period.
+    return not data.config.op_hours_24_hours_per_day and not (data.config.open_at <= current < data.config.closed_at)
+
+
+def poll_weather(data):
+    # The scheduler runs this whenever the adaptive poller says new data should be available.
+    # Returns the number of seconds until it should run again.
+
+    if is_after_hours(data) and data.config.davis_user != "" and data.local is None:
         # FYI: The V1 API maintains its own high/lows and when using V1, we read
-        # those directly.
-        if data.config.davis_user == "":  # Using V2 API
-            get_temp(data)
-            
-        # if the after hours timer has never been initialize or we are just entering after hours for the first time today...
-        if not data.timer_blink or not data.after_hours:
+        # those directly.  So there is nothing to fetch while the display is off.
+        return data.poller.idle_delay()
+
+    # Even if it is after hours, if we are using the V2 API or a WeatherLink Live, we must continuously
+    # read the temperature so that the daily highs and lows can be maintained
+    # by this program even though we are not displaying anything during this period.
+    previous = data.observed_at
+    data.last_result = get_temp(data)
+
+    # Show new data (or a new error) straight away rather than waiting for the next main loop.  Which
+    # pane is showing, and when it flips, is only decided by the main loop on its minute grid.  A
+    # WeatherLink Live has new data every poll, which would otherwise restart the flips every 10 seconds.
+    if not data.after_hours and (data.observed_at != previous or not data.last_result[0]):
+        if data.last_result[0]:
+            refresh_display(data)
+        else:
+            error_display(data, data.last_result[1])
 
-            data.after_hours = True
-            Blink_pixel(data).blink()
+    if data.startup is not None:
+        data.startup.phase('first data')
+        data.startup.log()
+        data.startup = None
 
-    else:  # opening hours
+    now = time.time()
+    if data.source == 'local':
+        return data.local.poller.next_delay(data.observed_at, now)
 
-        success, msg = get_temp(data)
+    delay = data.poller.next_delay(data.observed_at, now)
+    if data.local is not None:
+        # Don't wait on the Davis server past the time to try the WeatherLink Live again
+        delay = min(delay, max(data.local.retry_in(now), data.local.poller.min_interval))
+    return delay
 
-        # This will cause the after hours blinking to not re-trigger itself.
-        data.after_hours = False
 
-        if success:
-            # We have good data for displaying
-            
-            if not data.config.show_UV:
-                data.show_hi_lo_temp = True
+def show_weather(data):
+    # Called by the main loop once a minute.  Picks the pane to show and arms the flip back to UV.
+    success, msg = data.last_result
 
-            elif not is_sun_above(data):
-                # This sun is not high in the sky so show the high/lows
-                data.show_hi_lo_temp = True
+    if success:
+        # We have good data for displaying
+        
+        if not data.config.show_UV:
+            data.show_hi_lo_temp = True
 
-            elif data.config.show_temp_with_UV:
-                # Sun high in the sky (show UV) but you wanted to still show high/lows initially
-                data.show_hi_lo_temp = True
+        elif not is_sun_above(data):
+            # This sun is not high in the sky so show the high/lows
+            data.show_hi_lo_temp = True
 
-                # Set a timer to flip back to UV in a few (configurable) seconds
-                data.timer_show_UV = threading.Timer(data.config.hi_lo_temp_length_seconds, enable_UV, [data])
-                data.timer_show_UV.start()
+        elif data.config.show_temp_with_UV:
+            # Sun high in the sky (show UV) but you wanted to still show high/lows initially
+            data.show_hi_lo_temp = True
 
-            else:  # The sun is above and we want only UV
-                data.show_hi_lo_temp = False
+            # Flip back to UV in a few (configurable) seconds
+            data.scheduler.cancel(data.job_show_UV)
+            data.job_show_UV = data.scheduler.call_later('show_UV', data.config.hi_lo_temp_length_seconds,
+                                                         enable_UV, data)
 
-            refresh_display(data)
+        else:  # The sun is above and we want only UV
+            data.show_hi_lo_temp = False
+
+        refresh_display(data)
+
+    else:  # We had an error while attempting to get our weather data
+        error_display(data, msg)
+
+
+def main_loop(data):
+    # this loop is executed every 60 seconds.  The weather data itself is fetched by poll_weather()
+    # and the brightness is looked after by ramp_brightness().
+
+    stage = time.perf_counter()
+    after_hours = is_after_hours(data)
+    data.spans.mark('main_loop.hours', stage)
+
+    if after_hours:
+        # closed hours
+
+        # if the after hours blink has never been started or we are just entering after hours for the first time today...
+        if not data.job_blink or not data.after_hours:
 
-        else:  # We had an error while attempting to get our weather data
-            error_display(data, msg)
+            data.after_hours = True
+            data.scheduler.cancel(data.job_blink)
+            data.job_blink = data.scheduler.add_job('blink', 1, Blink_pixel(data).blink, budget=0.5)
+
+    else:  # opening hours
+
+        # Stop the after hours blinking
+        data.after_hours = False
+        data.scheduler.cancel(data.job_blink)
+        data.job_blink = None
+
+        # Show the 24 hour trend for the last few seconds before the next main loop.  Only armed here so
+        # it stays on the minute grid however often new data arrives.
+        data.show_trend = False
+        if data.config.trend_length_seconds:
+            data.scheduler.cancel(data.job_show_trend)
+            data.job_show_trend = data.scheduler.call_later('show_trend', 60 - data.config.trend_length_seconds,
+                                                            enable_trend, data)
 
-    # For monitoring purposes, send IoT feed CPU temperature every 10 minutes
-    # If enabled, an email notification is sent if nothing received after one hour.
-    if datetime.now().minute % 10 == 0:
+        show_weather(data)
+
+
+def read_cpu_temperature(data):
+    # The CPU temperature, or None if it cannot be read.  The sensor is opened once.  If that fails
+    # (not a Pi) it is not tried again: each try leaves gpiozero's failed pin factory search behind.
+    if data.cpu_sensor is None:
         try:
-            #  CPU T:61.3 Err:123 Up:123 Mem Use:45% Light:30k Brightness:100%
-            message = "CPU T:%4.1f Err:%3d" % (CPUTemperature().temperature, data.master_error_count )
-            message += " Up:%3d Mem Use:%2d%%" % ((datetime.now()-data.start_time).days, psutil.virtual_memory().percent)
-            message += " Light:"
-            if data.light > 999:
-                message += "%2dk" % int(data.light/1000)
-            else:
-                message += "%3d" % data.light
-            message += " Brightness:%3d%%" % data.matrix.brightness
-
-            data.io_client.send(data.config.adafruitIO_feed, message)
-            
-        except (requests.exceptions.RequestException, RequestError):
-            pass
-            # We don't care if this fails or why as we will
-            # receive the email notification after one hour
-            # First exception above captures Connection error timeouts
-            # and second exception captures a bad API key
-            
-        except Exception as err:
-            # Catch anything else here
-            data.master_error_count += 1
-            logging.error(f'Total error count: {data.master_error_count}.\n'
-                f'                     An unhandled exception occurred. {type(err).__name__}: {err}')
+            from gpiozero import CPUTemperature
+            data.cpu_sensor = CPUTemperature()
+        except Exception:
+            data.cpu_sensor = False
 
-    # Fire this main loop again in 60 seconds
-    data.timer_main = threading.Timer(60, main_loop, [data])
-    data.timer_main.start()
+    if not data.cpu_sensor:
+        return None
+    try:
+        return round(data.cpu_sensor.temperature, 1)
+    except Exception:  # the thermal zone could not be read
+        return None
+
+
+def report_iot(data):
+    # For monitoring purposes, the scheduler runs this to send the IoT feeds the CPU temperature and other
+    # statistics every 10 minutes.  If enabled, an email notification is sent if nothing received after one hour.
+    # The values are only queued here.  The telemetry worker thread does the uploading.
+    import psutil
+
+    cpu_temperature = read_cpu_temperature(data)
+
+    data.telemetry.put({'cpu-temperature': cpu_temperature,
+                        'errors': data.master_error_count,
+                        'uptime-days': (datetime.now() - data.start_time).days,
+                        'memory-percent': psutil.virtual_memory().percent,
+                        'light': round(data.light) if data.light is not None else None,
+                        'brightness': data.matrix.brightness})
+
+
+def collect_metrics(data, exposition):
+    # Fills in a scrape of the metrics endpoint.  Runs on the metrics server's thread and only reads
+    # what the display keeps anyway.
+    import psutil
+
+    cpu_temperature = read_cpu_temperature(data)
+
+    exposition.counter('api_errors', 'Weather fetches that failed.', data.master_error_count)
+    exposition.gauge('consecutive_api_errors', 'Weather fetches that have failed in a row.', data.error_count)
+    exposition.gauge('temperature', 'Temperature shown, in the display units.', data.temp_now)
+    exposition.gauge('uv_index', 'UV index shown.', data.UV)
+    exposition.gauge('brightness_percent', 'Matrix brightness.', data.matrix.brightness)
+    if data.light_sensor is not None:
+        exposition.gauge('light_lux', 'Light sensor reading.', data.light)
+    exposition.gauge('cpu_temperature_celsius', 'Raspberry Pi CPU temperature.', cpu_temperature)
+    exposition.gauge('resident_memory_bytes', 'Resident memory of the display process.',
+                     psutil.Process().memory_info().rss)
+    exposition.gauge('memory_percent', 'Memory in use on the whole system.', psutil.virtual_memory().percent)
+    exposition.gauge('uptime_seconds', 'Time since the display started.',
+                     round((datetime.now() - data.start_time).total_seconds()))
+
+    fetches = sorted(data.http.histograms().items())
+    exposition.histograms('fetch_seconds', 'Time taken by HTTP requests that were answered.',
+                          [({'endpoint': name}, histogram) for name, (histogram, errors) in fetches])
+    exposition.counters('fetch_errors', 'HTTP requests that got no answer.',
+                        [({'endpoint': name}, errors) for name, (histogram, errors) in fetches])
+
+    if data.scheduler is not None:
+        jobs = sorted(data.scheduler.stats().items())
+        exposition.gauges('job_drift_seconds', 'How late the last run of each job started.',
+                          [({'job': name}, s['last_drift']) for name, s in jobs])
+        exposition.gauges('job_max_drift_seconds', 'Latest any run of each job started.',
+                          [({'job': name}, s['max_drift']) for name, s in jobs])
+        exposition.gauges('job_runtime_seconds', 'Time taken by the last run of each job.',
+                          [({'job': name}, s['last_runtime']) for name, s in jobs])
+        for key, help_text in (('runs', 'Runs of each job.'), ('errors', 'Runs of each job that raised.'),
+                               ('overruns', 'Runs of each job that took longer than their budget.'),
+                               ('skipped', 'Runs of each job dropped because it fell behind.')):
+            exposition.counters('job_' + key, help_text, [({'job': name}, s[key]) for name, s in jobs])
+
+    exposition.histograms('render_seconds', 'Time taken to draw a weather frame.', [(None, data.render_time)])
+    exposition.histograms('stage_seconds', 'Time taken by each stage of fetching and drawing.',
+                          [({'stage': stage}, histogram) for stage, histogram in data.spans.histograms()])
+    frames = data.frame_state.stats()
+    exposition.counters('frames', 'Frames by what was drawn.',
+                        [({'drawn': 'none'}, frames['skipped']), ({'drawn': 'full'}, frames['full']),
+                         ({'drawn': 'right_pane'}, frames['partial'])])
+
+
+def schedule_jobs(data):
+    # Each job runs on a fixed grid of deadlines.  If the main loop ever runs long, the missed
+    # minutes are skipped rather than fired back to back.  The IoT report only needs to arrive
+    # at least once an hour so it is allowed to catch up.
+    # The weather poll picks its own pace so it is added first and runs before the first main loop.
+    data.scheduler.add_job('poll', 60, poll_weather, data, budget=50)
+    data.scheduler.add_job('main_loop', 60, main_loop, data, budget=10, overrun=scheduler.SKIP)
+    data.scheduler.add_job('brightness', 1, ramp_brightness, data, delay=1, budget=0.5)
+    data.scheduler.add_job('history_compact', 24 * 60 * 60, compact_history, data, delay=24 * 60 * 60, budget=30)
+    if data.light_sensor is not None:
+        data.scheduler.add_job('light_sensor', 2, sample_light, data, budget=0.5)
+    if data.telemetry is not None:
+        data.telemetry.start()
+        data.scheduler.add_job('report_iot', 600, report_iot, data, delay=60, budget=1, overrun=scheduler.CATCH_UP,
+                               max_catch_up=1)
+
+
+class StartupTimer:
+    # Time taken by each step from the module being imported to the first data being shown
+    def __init__(self, started):
+        self.started = started
+        self.last = started
+        self.phases = []  # (name, seconds)
+
+    def phase(self, name):
+        # The step called name has just finished
+        now = time.monotonic()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def log(self):
+        logging.info('Startup: %s.  Total %.2fs',
+                     ', '.join('%s %.2fs' % phase for phase in self.phases), self.last - self.started)
 
 
 def run():
@@ -1111,44 +1413,100 @@ def run():
     rootLogger.addHandler(consoleHandler)
 
     logging.info('Executing temperature display')
+    startup = StartupTimer(STARTED)
+    startup.phase('imports')
+
     # Get command line arguments, if any
     commandArgs = args()
 
+    # Real panels or the emulator
+    load_backend(commandArgs.backend)
+    startup.phase('backend')
+
     # Initialize matrix option with defaults and override with any command line arguments
     matrixOptions = led_matrix_options(commandArgs)
 
     # Initialize the matrix
     matrix = RGBMatrix(options=matrixOptions)
+    startup.phase('matrix')
 
     # Get the configuration values
     config = Config()
 
     # initialize our global data variables
     data = Data(config, matrix)
-    
-    # testing
-    # set up keyboard listener for stats and testing purposes
-    listener = keyboard.Listener(functools.partial(on_key_press, data))
-    listener.start()
+    data.startup = startup
+    startup.phase('config and fonts')
 
-    try:
-        main_loop(data)
+    # Start at the right brightness rather than ramping to it from 100%.  Until the light sensor
+    # has been read, this is the estimate from the time of day.
+    set_brightness(data)
+    matrix.brightness = data.target_brightness
 
-        while True:
-            pass
+    # Put something on the panels straight away.  The first fetch from Davis can take a while.
+    error_display(data, data.last_result[1])
+    startup.phase('boot frame')
 
-    except KeyboardInterrupt:
+    if data.light_sensor is not None:
+        # Grab first reading to ensure sensor is available
+        data.light_sensor.sample()
+        if not data.light_sensor.available:
+            logging.warning('Light sensor not found or not connected, falling back to software mode until it responds.')
+        set_brightness(data)
+        matrix.brightness = data.target_brightness
+        startup.phase('light sensor')
 
-        # Kill any timers that were running
-        if data.timer_main:
-            data.timer_main.cancel()
-        if data.timer_blink:
-            data.timer_blink.cancel()
-        if data.timer_show_UV:
-            data.timer_show_UV.cancel()
-            
-        logging.info('Exiting temperature display')
-        raise KeyboardInterrupt
+    # testing
+    # set up keyboard listener for stats and testing purposes.  Needs a keyboard / desktop session.
+    try:
+        from pynput import keyboard
+        listener = keyboard.Listener(functools.partial(on_key_press, data))
+        listener.start()
+    except ImportError as err:
+        logging.info('Keyboard listener not available: %s', err)
+
+    # One scheduler owns all of the periodic work.  The main thread sleeps in it between jobs
+    # and it returns on CTRL-C (SIGINT) or SIGTERM.
+    data.scheduler = Scheduler()
+    data.scheduler.install_signal_handlers()
+    data.watchdog.start()
+    schedule_jobs(data)
+
+    metrics_server = None
+    if data.config.metrics_port:
+        metrics_server = MetricsServer(data.config.metrics_address, data.config.metrics_port,
+                                       functools.partial(collect_metrics, data))
+        metrics_server.start()
+
+    # Profiling is started here or by SIGUSR1 and stops itself after the configured minutes
+    data.profiler = Profiler(data.scheduler, data.config.profile_mode, data.config.profile_minutes)
+    data.profiler.install_signal_handler()
+    if data.config.profile_at_start:
+        data.profiler.start()
+
+    data.scheduler.run()
+
+    data.profiler.stop()
+    data.profiler.log_stats()
+    data.spans.log_stats()
+    if metrics_server is not None:
+        metrics_server.stop()
+        metrics_server.log_stats()
+    data.scheduler.log_stats()
+    data.http.log_stats()
+    data.poller.log_stats()
+    if data.local is not None:
+        data.local.log_stats()
+    data.history.close()
+    data.history.log_stats()
+    data.frame_state.log_stats()
+    data.watchdog.stop()
+    data.watchdog.log_stats()
+    data.http.close()
+    if data.telemetry is not None:
+        data.telemetry.stop()
+        data.telemetry.log_stats()
+    logging.info('Exiting temperature display')
 
 
 if __name__ == "__main__":
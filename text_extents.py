@@ -0,0 +1,44 @@
+# LED matrix temperature / UV display
+# Text width cache.  Works out how many pixels a string will take from each glyph's advance
+# width, so the layout no longer has to draw text on the canvas just to measure it.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+# The library draws this glyph in place of any character the font does not have
+REPLACEMENT_CHARACTER = 0xFFFD
+
+# Most strings we measure are temperatures which repeat all day, but don't let an unexpected
+# stream of new strings grow the cache forever.
+MAX_STRINGS = 1024
+
+
+class TextExtents:
+    def __init__(self):
+        self._glyphs = {}  # (font, codepoint) -> advance width in pixels
+        self._strings = {}  # (font, text) -> width in pixels
+
+    def _glyph_width(self, font, codepoint):
+        key = (id(font), codepoint)
+        width = self._glyphs.get(key)
+        if width is None:
+            # Same rules as graphics.DrawText - missing glyphs fall back to the replacement
+            # character and take no space if the font does not have that either.
+            width = font.CharacterWidth(codepoint)
+            if width < 0:
+                width = font.CharacterWidth(REPLACEMENT_CHARACTER)
+            if width < 0:
+                width = 0
+            self._glyphs[key] = width
+        return width
+
+    def width(self, font, text):
+        # Pixel width of text in font.  Matches the value graphics.DrawText returns.
+        key = (id(font), text)
+        width = self._strings.get(key)
+        if width is None:
+            width = sum(self._glyph_width(font, ord(c)) for c in text)
+            if len(self._strings) >= MAX_STRINGS:
+                self._strings.clear()
+            self._strings[key] = width
+        return width
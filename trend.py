@@ -0,0 +1,84 @@
+# LED matrix temperature / UV display
+# The last 24 hours of readings, for the trend pane.  Readings go into preallocated NumPy arrays
+# used as a ring buffer, at most one a minute, so memory use is fixed however fast the station
+# updates.  sparkline() turns them into one bar height per panel column with no Python loop per
+# reading or per column.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import numpy as np
+
+SPAN_SECONDS = 24 * 60 * 60
+
+# Least time between two readings kept
+SPACING_SECONDS = 60
+
+
+class RecentReadings:
+    def __init__(self, span=SPAN_SECONDS, spacing=SPACING_SECONDS):
+        self.span = span
+        self.spacing = spacing
+        self.capacity = span // spacing + 1
+
+        self.ts = np.zeros(self.capacity, dtype=np.float64)
+        self.temp = np.full(self.capacity, np.nan, dtype=np.float32)  # in the units shown
+        self.uv = np.full(self.capacity, np.nan, dtype=np.float32)
+
+        self._next = 0  # where the next reading goes
+        self.count = 0
+        self._last_ts = None
+
+    def append(self, ts, temp, uv):
+        if self._last_ts is not None and ts - self._last_ts < self.spacing:
+            return
+        self._last_ts = ts
+
+        i = self._next
+        self.ts[i] = ts
+        self.temp[i] = np.nan if temp is None else temp
+        self.uv[i] = np.nan if uv is None else uv
+        self._next = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def extend(self, ts, temp, uv):
+        # Adds arrays of readings in time order, e.g. from the history file at startup
+        for reading in zip(ts.tolist(), temp.tolist(), uv.tolist()):
+            self.append(*reading)
+
+    def window(self, now):
+        # (ts, temp, uv) of the readings in the span up to now, oldest first
+        if self.count < self.capacity:
+            ts, temp, uv = self.ts[:self.count], self.temp[:self.count], self.uv[:self.count]
+        else:
+            order = np.r_[self._next:self.capacity, 0:self._next]
+            ts, temp, uv = self.ts[order], self.temp[order], self.uv[order]
+
+        first = np.searchsorted(ts, now - self.span, side='right')
+        return ts[first:], temp[first:], uv[first:]
+
+
+def sparkline(ts, values, now, columns, rows, span=SPAN_SECONDS):
+    # Bins the readings into columns, oldest on the left, and scales the mean of each between the
+    # lowest and highest of them.  Returns (means, heights): heights run from 0 (the lowest) to rows - 1
+    # and are -1 where a column has no readings.  None if there are no readings at all.
+    keep = ~np.isnan(values)
+    if not keep.any():
+        return None
+
+    column = ((ts[keep] - (now - span)) * columns // span).astype(np.int64).clip(0, columns - 1)
+    counts = np.bincount(column, minlength=columns)
+    sums = np.bincount(column, values[keep].astype(np.float64), minlength=columns)
+
+    has_data = counts > 0
+    means = np.full(columns, np.nan)
+    np.divide(sums, counts, out=means, where=has_data)
+
+    low, high = means[has_data].min(), means[has_data].max()
+    if high > low:
+        scaled = np.rint((means - low) * ((rows - 1) / (high - low)))
+    else:
+        scaled = np.full(columns, (rows - 1) // 2)  # flat line in the middle
+
+    heights = np.where(has_data, scaled, -1).astype(np.int64)
+    return means, heights
@@ -0,0 +1,93 @@
+# LED matrix temperature / UV display
+# WeatherLink Live on the local network.  The device answers its own current conditions request
+# (http://<host>/v1/current_conditions) with readings a few seconds old, where the Davis servers
+# can be up to 15 minutes behind on a free plan.  When it is set up in config.json it is read in
+# preference to the servers, which are then only used while it cannot be reached.
+#
+# The device's UDP real-time broadcast (port 22222, every 2.5 seconds) is not used: it only carries
+# wind and rain, never temperature or UV.
+
+# MIT License
+# Copyright (c) 2025 by Russell Ingleton
+
+import time
+import logging
+
+from observation import loads, parse_local
+from polling import AdaptivePoller
+
+# Davis asks that the device be read no more often than this
+UPDATE_SECONDS = 10
+
+# After a failure the device is left alone for this long, doubling each time, while the Davis
+# servers are used instead.
+RETRY_MIN_SECONDS = 60
+RETRY_MAX_SECONDS = 15 * 60
+
+
+class LocalStation:
+    def __init__(self, host):
+        self.host = host  # name or address, optionally with :port
+        self.url = f'http://{host}/v1/current_conditions'
+
+        # Readings change every few seconds so there is nothing to learn.  Poll at the device's pace.
+        self.poller = AdaptivePoller(UPDATE_SECONDS, min_interval=UPDATE_SECONDS, late_interval=UPDATE_SECONDS,
+                                     max_backoff=RETRY_MIN_SECONDS, settle=0, jitter=1)
+
+        self.active = True  # False while falling back to the Davis servers
+        self._retry_at = 0.0
+        self._retry_delay = RETRY_MIN_SECONDS
+
+        # statistics
+        self.fetches = 0
+        self.failures = 0
+        self.fallbacks = 0
+
+    def due(self, now):
+        # Whether to try the device on this poll
+        return self.active or now >= self._retry_at
+
+    def retry_in(self, now):
+        # Seconds until the device should be tried again.  0 if it is in use.
+        return 0 if self.active else max(0.0, self._retry_at - now)
+
+    def fetch(self, http, time_left=None):
+        # The current observation.  Raises a requests exception if the device cannot be reached or
+        # answers with an HTTP error, and ValueError, KeyError or TypeError if the answer is not usable.
+        self.fetches += 1
+        response = http.get(self.url, 'local', time_left=time_left)
+        response.close()
+        response.raise_for_status()
+        observation = parse_local(loads(response.content))
+
+        if not self.active:
+            logging.info('WeatherLink Live at %s is back.  Using it again.', self.host)
+            self.active = True
+        self._retry_delay = RETRY_MIN_SECONDS
+        return observation
+
+    def failed(self, err, fallback):
+        # The device could not be read.  With a fallback, it is left alone for a while.
+        self.failures += 1
+        if not fallback:
+            return
+
+        if self.active:
+            self.fallbacks += 1
+            logging.warning('Could not read the WeatherLink Live at %s: %s\n'
+                            '                     Using the Davis servers.  Trying it again in %d seconds.',
+                            self.host, err, self._retry_delay)
+        self.active = False
+        self._retry_at = time.time() + self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, RETRY_MAX_SECONDS)
+
+    def stats(self):
+        return {'fetches': self.fetches,
+                'failures': self.failures,
+                'fallbacks': self.fallbacks,
+                'active': self.active}
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info('WeatherLink Live reads:%d failed:%d fell back to Davis servers:%d',
+                     s['fetches'], s['failures'], s['fallbacks'])